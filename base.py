@@ -1,5 +1,6 @@
 """Base file containing all the base variables."""
 import pygame
+import threading
 
 size = 1650, 1050  # Window size
 size_mult = 1650 / size[0], 1050 / size[1]
@@ -8,10 +9,8 @@ closed = False  # Set this to true to close the game
 FPS = 60  # Ticks per second
 elapsed = 0  # Elapsed time, in milliseconds
 game_speed = 1000 / FPS  # Game speed, 1000 milliseconds / game speed, in FPS
-drawn = {'bg': [],  # Things in bg don't do collide checks
-         'collides': [],  # Anything with the name collide will do collision checks
-         'tg': [],  # Same as bg, except it gets drawn on top of collides and bg
-         'ui': []}  # UI won't offset based on camera position
+frame_rate = 0  # Frames drawn per second, 0 to match the display's refresh rate. Ticks always happen FPS times a second
+dirty_rects = False  # Only repaint the parts of the screen which change while playing, see renderer.py
 
 images = {}
 
@@ -128,15 +127,102 @@ class Base:
         pass
 
 
+class Pool:
+    """Keeps things which aren't used anymore so they can be set up again instead of made from scratch.
+    Acquiring calls __init__ on a pooled thing again, so everything has to get set up there.
+    Things must not be in drawn anymore when they get released, since they come back alive."""
+    def __init__(self, kind: type, max_size: int=4096):
+        self.kind = kind
+        self.max_size = max_size
+        self.free = []
+        self.made = 0  # Times the pool was empty and a new thing was made
+        self.reused = 0
+        self.lock = threading.Lock()  # Levels get built on worker threads too
+
+    def __repr__(self):
+        return f'Pool({self.kind.__name__}, {len(self.free)} free, {self.made} made, {self.reused} reused)'
+
+    def __len__(self) -> int:
+        return len(self.free)
+
+    def acquire(self, *args, **kwargs):
+        """Returns kind(*args, **kwargs), reusing a released thing if there is one."""
+        with self.lock:
+            if self.free:
+                thing = self.free.pop()
+                self.reused += 1
+            else:
+                thing = None
+                self.made += 1
+        if thing is None:
+            return self.kind(*args, **kwargs)
+        thing.__init__(*args, **kwargs)
+        return thing
+
+    def release(self, things):
+        """Give things back to the pool. Anything past max_size is left for the garbage collector."""
+        with self.lock:
+            for thing in things:
+                if len(self.free) >= self.max_size:
+                    break
+                self.free.append(thing)
+
+    def clear(self):
+        with self.lock:
+            self.free = []
+
+
+class Scene:
+    """Everything that gets ticked and drawn, split in to sections which get drawn one after the other.
+    Dead things (die is True) should be skipped, and get removed all at once by compact instead of one at a time.
+    Compacting replaces a section's list instead of changing it, so a section can be gone through while it happens."""
+    def __init__(self, *sections: str):
+        self.sections = {section: [] for section in sections}
+
+    def __repr__(self):
+        counts = ', '.join(f'{section}: {count}' for section, count in self.counts().items())
+        return f'Scene({counts})'
+
+    def __getitem__(self, section: str) -> list:
+        return self.sections[section]
+
+    def __len__(self) -> int:
+        return sum(len(things) for things in self.sections.values())
+
+    def items(self):
+        """(section, list of things) in drawing order."""
+        return self.sections.items()
+
+    def add(self, section: str, thing: Base, index: int=None):
+        if index is None:
+            self.sections[section].append(thing)
+        else:
+            self.sections[section].insert(index, thing)
+
+    def compact(self, *sections: str):
+        """Remove every dead thing from these sections, or from every section if none are given."""
+        for section in sections or tuple(self.sections):
+            things = self.sections[section]
+            alive = [thing for thing in things if thing.die is False]
+            if len(alive) != len(things):
+                self.sections[section] = alive
+
+    def counts(self) -> dict:
+        """Amount of things in each section, dead things which haven't been compacted yet included."""
+        return {section: len(things) for section, things in self.sections.items()}
+
+    def clear(self, *sections: str):
+        for section in sections or tuple(self.sections):
+            self.sections[section] = []
+
+
+drawn = Scene('bg',  # Things in bg don't do collide checks
+              'collides',  # Anything with the name collide will do collision checks
+              'tg',  # Same as bg, except it gets drawn on top of collides and bg
+              'ui')  # UI won't offset based on camera position
+
+
 def add_to_drawn(section: str, thing: Base, index: int=None):
     """Add a thing to a specific section. Leaving out index will append it,
     otherwise will insert at specific index."""
-    if index is None:
-        drawn[section].append(thing)
-    else:
-        drawn[section].insert(index, thing)
-
-
-def remove_from_drawn(section: str, index: int):
-    """Remove a thing from a specific section using a specific index."""
-    del drawn[section][index]
+    drawn.add(section, thing, index)
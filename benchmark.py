@@ -0,0 +1,128 @@
+"""Benchmarks every campaign level headlessly.
+Each level gets loaded, played for a number of ticks with scripted movement and drawn to an offscreen surface every tick,
+a few times over, keeping the median times.
+Results can be saved as a baseline and later runs compared against it, to catch changes which make levels slower.
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.25"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import pygame
+from base import size
+from repository import levels
+from simulation import Simulation
+
+METRICS = ('load_ms', 'tick_us', 'draw_ms', 'peak_kb')  # Higher is worse for all of them
+MOVES = (pygame.K_d, pygame.K_s, pygame.K_a, pygame.K_w)
+
+
+def script(ticks: int, hold: int=30) -> list:
+    """Inputs which go around in a square, holding each direction for hold ticks, the same every run."""
+    inputs = []
+    for i, tick in enumerate(range(0, ticks, hold)):
+        key = MOVES[i % len(MOVES)]
+        inputs.append((tick, key, True))
+        inputs.append((tick + hold, key, False))
+    return inputs
+
+
+def load(name: str) -> Simulation:
+    """Load a level from scratch, parsing included."""
+    levels.cache.clear()
+    return Simulation(name)
+
+
+def bench_level(name: str, ticks: int, repeat: int) -> dict:
+    load_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        sim = load(name)
+        load_times.append(time.perf_counter() - start)
+        sim.close()
+
+    surface = pygame.Surface(size)
+    tick_times, draw_times = [], []
+    for _ in range(repeat):
+        sim = load(name)
+        sim.feed(script(ticks))
+        tick_time = draw_time = 0
+        for _ in range(ticks):
+            start = time.perf_counter()
+            sim.advance(1)
+            middle = time.perf_counter()
+            surface.fill((180, 180, 180))
+            sim.draw(surface, (0, 0))
+            draw_time += time.perf_counter() - middle
+            tick_time += middle - start
+        tick_times.append(tick_time / ticks)
+        draw_times.append(draw_time / ticks)
+        sim.close()
+
+    gc.collect()  # So garbage from before isn't freed in the middle of measuring
+    tracemalloc.start()  # Separately, since tracing slows everything down
+    with load(name) as sim:
+        sim.run(script(ticks), ticks)
+        peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'load_ms': statistics.median(load_times) * 1000,
+            'tick_us': statistics.median(tick_times) * 1e6,
+            'draw_ms': statistics.median(draw_times) * 1000,
+            'peak_kb': peak / 1024,
+            'ticks': sim.ticks,
+            'deaths': sim.deaths}
+
+
+def run(names: list, ticks: int, repeat: int) -> dict:
+    results = {}
+    for name in names:
+        results[name] = bench_level(name, ticks, repeat)
+        result = results[name]
+        print(f'{name:<14}' + ''.join(f'{metric} {result[metric]:>9.2f}  ' for metric in METRICS))
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Returns (level, metric, baseline, now) for everything more than threshold (0.25 is 25%) worse than the baseline."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f'{name}: not in the baseline')
+            continue
+        for metric in METRICS:
+            if metric in before and result[metric] > before[metric] * (1 + threshold):
+                regressions.append((name, metric, before[metric], result[metric]))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark loading, ticking and drawing every campaign level.')
+    parser.add_argument('names', nargs='*', help='Levels to benchmark, every campaign level if none are given')
+    parser.add_argument('--ticks', type=int, default=600, help='Ticks to play each level for')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs to take the median times of')
+    parser.add_argument('--save', help='Write the results to this json file')
+    parser.add_argument('--compare', help='Baseline json file to compare the results against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='How much worse than the baseline counts as a regression')
+    args = parser.parse_args()
+
+    results = run(args.names or levels.campaign_levels(), args.ticks, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'ticks': args.ticks, 'levels': results}, file, indent=4)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.loads(file.read())
+        if baseline['ticks'] != args.ticks:
+            print(f'Baseline was made with {baseline["ticks"]} ticks, not {args.ticks}')
+        regressions = compare(results, baseline['levels'], args.threshold)
+        for name, metric, before, now in regressions:
+            print(f'REGRESSION {name} {metric}: {before:.2f} -> {now:.2f} ({now / before - 1:+.0%})')
+        if regressions:
+            sys.exit(1)
+        print('No regressions')
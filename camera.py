@@ -0,0 +1,47 @@
+"""What part of the world is on screen."""
+
+
+class Camera:
+    """A window sized view in to the world, used to skip drawing things which wouldn't end up on screen.
+    Things are checked by their bounds (world x, y, width, height). Things without bounds always get drawn."""
+    def __init__(self, view_size: tuple, position: tuple=(0, 0), margin: int=0):
+        self.width, self.height = view_size
+        self.x, self.y = position
+        self.margin = margin  # Extra space around the view which still counts as visible
+        self.shown = 0  # Things which passed visible since the last move
+        self.culled = 0
+
+    def __repr__(self):
+        return f'Camera(({self.x}, {self.y}), {self.width}x{self.height}, {self.shown} shown, {self.culled} culled)'
+
+    @property
+    def offsets(self) -> tuple:
+        """What gets passed to draw for world things."""
+        return self.x, self.y
+
+    @property
+    def rect(self) -> tuple:
+        """The visible part of the world as x, y, width, height, margin included."""
+        margin = self.margin
+        return self.x - margin, self.y - margin, self.width + margin * 2, self.height + margin * 2
+
+    def move(self, x: float, y: float):
+        """Point the camera somewhere else. Done once a frame, so it also starts the shown and culled counts over."""
+        self.x, self.y = x, y
+        self.shown = 0
+        self.culled = 0
+
+    def overlaps(self, bounds: tuple) -> bool:
+        x, y, w, h = bounds
+        margin = self.margin
+        return (x + w >= self.x - margin and x <= self.x + self.width + margin
+                and y + h >= self.y - margin and y <= self.y + self.height + margin)
+
+    def visible(self, thing) -> bool:
+        """True if this thing could be seen, or doesn't have bounds to tell."""
+        bounds = getattr(thing, 'bounds', None)
+        if bounds is None or self.overlaps(bounds):
+            self.shown += 1
+            return True
+        self.culled += 1
+        return False
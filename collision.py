@@ -0,0 +1,142 @@
+"""Broadphase collision helpers."""
+import math
+
+
+class SpatialHash:
+    """A uniform grid which buckets things by the cells their bounds cover.
+    Things only need to be checked against whatever shares a cell with them,
+    so the cost of a check scales with how crowded an area is, not the total amount of things."""
+    def __init__(self, cell_size: int=50, origin: tuple=(0, 0)):
+        self.cell_size = cell_size
+        self.ox, self.oy = origin  # Lines the cells up with the level tile grid
+        self.cells = {}  # (cell x, cell y): list of things in that cell
+        self.things = {}  # thing: [cells occupied, insertion order]
+        self.count = 0  # Used to keep query results in insertion order
+
+    def __repr__(self):
+        return f'SpatialHash({len(self.things)} things, {len(self.cells)} cells)'
+
+    def __len__(self) -> int:
+        return len(self.things)
+
+    def __contains__(self, thing) -> bool:
+        return thing in self.things
+
+    def cells_for(self, bounds: tuple) -> list:
+        """Returns every cell a x, y, width, height box touches, edges included."""
+        x, y, w, h = bounds
+        cs = self.cell_size
+        start_x, end_x = math.floor((x - self.ox) / cs), math.floor((x + w - self.ox) / cs)
+        start_y, end_y = math.floor((y - self.oy) / cs), math.floor((y + h - self.oy) / cs)
+        return [(cx, cy) for cy in range(start_y, end_y + 1) for cx in range(start_x, end_x + 1)]
+
+    def insert(self, thing, bounds: tuple=None):
+        """Add a thing to every cell its bounds covers. Uses thing.bounds if no bounds are given."""
+        if thing in self.things:
+            self.move(thing, bounds)
+            return
+        cells = self.cells_for(thing.bounds if bounds is None else bounds)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(thing)
+        self.things[thing] = [cells, self.count]
+        self.count += 1
+
+    def remove(self, thing):
+        entry = self.things.pop(thing, None)
+        if entry is None:
+            return
+        for cell in entry[0]:
+            bucket = self.cells[cell]
+            bucket.remove(thing)
+            if not bucket:
+                del self.cells[cell]
+
+    def move(self, thing, bounds: tuple=None):
+        """Re-bucket a thing which has moved. Does nothing if it still covers the same cells."""
+        entry = self.things.get(thing)
+        if entry is None:
+            self.insert(thing, bounds)
+            return
+        cells = self.cells_for(thing.bounds if bounds is None else bounds)
+        if cells == entry[0]:
+            return
+        for cell in entry[0]:
+            bucket = self.cells[cell]
+            bucket.remove(thing)
+            if not bucket:
+                del self.cells[cell]
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(thing)
+        entry[0] = cells
+
+    def query(self, bounds: tuple) -> list:
+        """Returns every thing sharing a cell with this box, in the order they were inserted."""
+        found = set()
+        for cell in self.cells_for(bounds):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        things = self.things
+        return sorted(found, key=lambda thing: things[thing][1])
+
+    def clear(self):
+        self.cells = {}
+        self.things = {}
+        self.count = 0
+
+
+class CollisionRegistry:
+    """Dispatch table of collision handlers keyed by a pair of types.
+    Only pairs which have a handler registered ever get visited."""
+    def __init__(self):
+        self.handlers = {}  # (type, type): handler(thing, other)
+        self.resolved = {}  # Cache of looked up pairs, subclasses included
+        self.sources = {}  # Cache of type: whether it's the first type of any registered pair
+
+    def __repr__(self):
+        return f'CollisionRegistry({len(self.handlers)} handlers)'
+
+    def register(self, type_a: type, type_b: type, handler):
+        """Call handler(thing, other) whenever a type_a thing is checked against a type_b thing."""
+        self.handlers[type_a, type_b] = handler
+        self.resolved = {}
+        self.sources = {}
+
+    def unregister(self, type_a: type, type_b: type):
+        self.handlers.pop((type_a, type_b), None)
+        self.resolved = {}
+        self.sources = {}
+
+    def handler_for(self, type_a: type, type_b: type):
+        """Returns the handler for this pair of types, falling back on their base classes. None if there isn't one."""
+        key = type_a, type_b
+        try:
+            return self.resolved[key]
+        except KeyError:
+            pass
+        handler = None
+        for base_a in type_a.__mro__:
+            for base_b in type_b.__mro__:
+                handler = self.handlers.get((base_a, base_b))
+                if handler is not None:
+                    break
+            if handler is not None:
+                break
+        self.resolved[key] = handler
+        return handler
+
+    def handles(self, thing) -> bool:
+        """Returns True if this thing has any handlers as the first of a pair."""
+        kind = type(thing)
+        try:
+            return self.sources[kind]
+        except KeyError:
+            result = any(issubclass(kind, type_a) for type_a, type_b in self.handlers)
+            self.sources[kind] = result
+            return result
+
+    def dispatch(self, thing, other):
+        """Runs the handler for this pair, if there is one."""
+        handler = self.handler_for(type(thing), type(other))
+        if handler is not None:
+            return handler(thing, other)
@@ -0,0 +1,255 @@
+"""Compiled level files.
+Level json spells out every tile as a dict and every tile's template gets resolved while loading.
+Compiling a level resolves the templates ahead of time into a palette, stores the tiles as one byte each
+and everything else as typed arrays, which get read straight out of a memory mapped file.
+
+Run this file to compile levels: python compiled.py [level names] (compiles every level if none are given)"""
+from base import BLUE_BASIC, BLUE_ENEMY, BLACK
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import numpy as np
+
+MAGIC = b'EGLV'
+VERSION = 1
+HEADER = struct.Struct('<4sBxxxI')  # Magic, version, meta length
+NO_ID = -2 ** 63  # Wall id of walls without a key
+# Arrays stored after the meta, in this order: name, dtype, shape (taken from the meta).
+# Positions are stored as int32 if every one of them is a whole number, otherwise as float64 (see the meta's 'floats')
+ARRAYS = (('tiles', np.uint8, ('size_y', 'size_x')),
+          ('walls', None, ('walls', 4)),  # sx, sy, ex, ey
+          ('wall_colors', np.uint8, ('walls', 3)),
+          ('wall_ids', np.int64, ('walls',)),
+          ('coins', None, ('coins', 2)),
+          ('keys', None, ('keys', 2)),
+          ('key_ids', np.int64, ('keys',)),
+          ('key_colors', np.uint8, ('keys', 3)),
+          ('enemies', None, ('enemies', 6)),  # x, y, speed, pivot x, pivot y, angle
+          ('enemy_pivots', np.uint8, ('enemies',)),
+          ('enemy_colors', np.uint8, ('enemies', 3)),
+          ('path_starts', np.int32, ('paths',)),  # Index of each enemy's first path point, plus the end
+          ('path_points', None, ('points', 2)))
+
+
+class CompileError(Exception):
+    pass
+
+
+def resolve_tile(tile_data: dict, templates: dict) -> tuple:
+    """Returns (color, nil, checkpoint, end, new x, new y, warp, warp x, warp y) of a tile in a level file.
+    Flags only come from the template, everything else can be overridden by the tile."""
+    template = tile_data.get('template', False)
+    template_data = templates[template] if template else tile_data
+    r, g, b = tile_data.get('color', template_data.get('color', BLUE_BASIC))
+    return ((r, g, b),
+            template_data.get('nil', False),
+            template_data.get('checkpoint', False),
+            template_data.get('end_level', False),
+            tile_data.get('newx', template_data.get('newx', 0)),
+            tile_data.get('newy', template_data.get('newy', 0)),
+            tile_data.get('warp', template_data.get('warp', False)),
+            tile_data.get('warpx', template_data.get('warpx', 0)),
+            tile_data.get('warpy', template_data.get('warpy', 0)))
+
+
+def positions(values: list, shape: tuple) -> np.ndarray:
+    """Array of positions, as ints if they're all whole numbers so they load back as ints."""
+    array = np.array(values, np.float64).reshape(shape)
+    if np.array_equal(array, np.round(array)) and np.all(np.abs(array) < 2 ** 31):
+        return array.astype(np.int32)
+    return array
+
+
+class JsonLevel:
+    """A level straight from its parsed json file. Has the same methods as CompiledLevel."""
+    def __init__(self, info: dict, templates: dict):
+        self.info = info
+        self.templates = templates
+        self.size_y = len(info['tiles'])
+        self.size_x = len(info['tiles'][0])
+        self.centered = info.get('centered', False)
+        self.spawn = info.get('spawnx', 100), info.get('spawny', 100)
+        self.next_level = info.get('next_level', False)
+        self.blurb = info.get('blurb', 'Sample Text')
+        self.tutorial_text = info.get('tutorial_text')
+
+    def __repr__(self):
+        return f'JsonLevel({self.size_x}x{self.size_y})'
+
+    def tile_rows(self) -> list:
+        """Rows of resolved tiles, see resolve_tile. Tiles which are only a template get resolved once per template."""
+        templates = self.templates
+        plain = {}  # template: resolved tile
+        rows = []
+        for row_y in self.info['tiles']:
+            row = []
+            for tile_data in row_y:
+                if len(tile_data) == 1 and 'template' in tile_data:
+                    template = tile_data['template']
+                    tile = plain.get(template)
+                    if tile is None:
+                        tile = plain[template] = resolve_tile(tile_data, templates)
+                else:
+                    tile = resolve_tile(tile_data, templates)
+                row.append(tile)
+            rows.append(row)
+        return rows
+
+    def walls(self) -> list:
+        """(sx, sy, ex, ey, color, axis, id) of every wall."""
+        return [(wall['sx'], wall['sy'], wall['ex'], wall['ey'], wall.get('color', BLACK), wall.get('axis', 'xy'), wall.get('id', None))
+                for wall in self.info['walls']]
+
+    def coins(self) -> list:
+        return [(coin['x'], coin['y']) for coin in self.info.get('coins', [])]
+
+    def keys(self) -> list:
+        """(x, y, id, color) of every key."""
+        return [(key['x'], key['y'], key['id'], key.get('color', (255, 255, 255))) for key in self.info.get('keys', [])]
+
+    def enemies(self) -> list:
+        """(x, y, speed, path, color, pivot, angle) of every enemy. Pivot is None for enemies which don't pivot."""
+        enemies = []
+        for enemy in self.info.get('enemies', []):
+            path = [tuple(point) for point in enemy.get('path', [])]
+            pivot = enemy.get('pivot', None)
+            enemies.append((enemy['x'], enemy['y'], enemy.get('speed', 0), path, enemy.get('color', BLUE_ENEMY),
+                            tuple(pivot) if pivot else None, enemy.get('angle', 0)))
+        return enemies
+
+
+class CompiledLevel:
+    """A compiled level file. The arrays are views in to the memory mapped file, nothing gets copied until it's used."""
+    def __init__(self, path: str):
+        with open(path, 'rb') as level_file:
+            self.map = mmap.mmap(level_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_length = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise CompileError(f'{path} is not a compiled level, or was compiled by an incompatible version')
+        index = HEADER.size
+        meta = json.loads(self.map[index:index + meta_length].decode())
+        index = align(index + meta_length)
+        self.arrays = {}
+        floats = meta['floats']
+        for name, dtype, shape in ARRAYS:
+            if dtype is None:
+                dtype = np.float64 if name in floats else np.int32
+            shape = tuple(meta[dim] if isinstance(dim, str) else dim for dim in shape)
+            count = math.prod(shape)
+            self.arrays[name] = np.frombuffer(self.map, dtype, count, index).reshape(shape)
+            index = align(index + count * np.dtype(dtype).itemsize)
+        self.size_x, self.size_y = meta['size_x'], meta['size_y']
+        self.centered = meta['centered']
+        self.spawn = tuple(meta['spawn'])
+        self.next_level = meta['next_level']
+        self.blurb = meta['blurb']
+        self.tutorial_text = meta['tutorial_text']
+        self.palette = [(tuple(color), *flags) for color, *flags in meta['palette']]
+
+    def __repr__(self):
+        return f'CompiledLevel({self.size_x}x{self.size_y}, {len(self.palette)} tile kinds)'
+
+    def tile_rows(self) -> list:
+        palette = self.palette
+        return [[palette[index] for index in row] for row in self.arrays['tiles'].tolist()]
+
+    def walls(self) -> list:
+        arrays = self.arrays
+        return [(sx, sy, ex, ey, tuple(color), 'xy', None if wall_id == NO_ID else wall_id)
+                for (sx, sy, ex, ey), color, wall_id in zip(arrays['walls'].tolist(), arrays['wall_colors'].tolist(), arrays['wall_ids'].tolist())]
+
+    def coins(self) -> list:
+        return [(x, y) for x, y in self.arrays['coins'].tolist()]
+
+    def keys(self) -> list:
+        arrays = self.arrays
+        return [(x, y, key_id, tuple(color))
+                for (x, y), key_id, color in zip(arrays['keys'].tolist(), arrays['key_ids'].tolist(), arrays['key_colors'].tolist())]
+
+    def enemies(self) -> list:
+        arrays = self.arrays
+        points = [(x, y) for x, y in arrays['path_points'].tolist()]
+        starts = arrays['path_starts'].tolist()
+        enemies = []
+        for i, ((x, y, speed, pivot_x, pivot_y, angle), pivots, color) in enumerate(
+                zip(arrays['enemies'].tolist(), arrays['enemy_pivots'].tolist(), arrays['enemy_colors'].tolist())):
+            pivot = (pivot_x, pivot_y) if pivots else None
+            enemies.append((x, y, speed, points[starts[i]:starts[i + 1]], tuple(color), pivot, angle))
+        return enemies
+
+
+def align(index: int) -> int:
+    """Arrays start on 8 byte boundaries."""
+    return index + -index % 8
+
+
+def compile_level(info: dict, templates: dict) -> bytes:
+    """Returns the compiled form of a parsed level file."""
+    source = JsonLevel(info, templates)
+    rows = source.tile_rows()
+    if any(len(row) != source.size_x for row in rows):
+        raise CompileError('Every row of tiles has to be the same length')
+    palette = {}  # resolved tile: palette index
+    grid = [[palette.setdefault(tile, len(palette)) for tile in row] for row in rows]
+    if len(palette) > 256:
+        raise CompileError('More than 256 different kinds of tiles')
+
+    walls, coins, keys, enemies = source.walls(), source.coins(), source.keys(), source.enemies()
+    paths = [enemy[3] for enemy in enemies]
+    starts = np.cumsum([0] + [len(path) for path in paths])
+    arrays = {'tiles': np.array(grid, np.uint8).reshape(source.size_y, source.size_x),
+              'walls': positions([wall[:4] for wall in walls], (-1, 4)),
+              'wall_colors': np.array([wall[4] for wall in walls], np.uint8).reshape(-1, 3),
+              'wall_ids': np.array([NO_ID if wall[6] is None else wall[6] for wall in walls], np.int64),
+              'coins': positions(coins, (-1, 2)),
+              'keys': positions([key[:2] for key in keys], (-1, 2)),
+              'key_ids': np.array([key[2] for key in keys], np.int64),
+              'key_colors': np.array([key[3] for key in keys], np.uint8).reshape(-1, 3),
+              'enemies': positions([(x, y, speed, *(pivot or (0, 0)), angle) for x, y, speed, path, color, pivot, angle in enemies], (-1, 6)),
+              'enemy_pivots': np.array([enemy[5] is not None for enemy in enemies], np.uint8),
+              'enemy_colors': np.array([enemy[4] for enemy in enemies], np.uint8).reshape(-1, 3),
+              'path_starts': starts.astype(np.int32),
+              'path_points': positions([point for path in paths for point in path], (-1, 2))}
+    meta = {'size_x': source.size_x, 'size_y': source.size_y, 'centered': source.centered, 'spawn': source.spawn,
+            'next_level': source.next_level, 'blurb': source.blurb, 'tutorial_text': source.tutorial_text,
+            'palette': list(palette), 'walls': len(walls), 'coins': len(coins), 'keys': len(keys),
+            'enemies': len(enemies), 'paths': len(starts), 'points': int(starts[-1]),
+            'floats': [name for name, array in arrays.items() if array.dtype == np.float64]}
+    meta = json.dumps(meta, separators=(',', ':')).encode()
+
+    buffer = bytearray(HEADER.pack(MAGIC, VERSION, len(meta)))
+    buffer += meta
+    for name, dtype, shape in ARRAYS:
+        buffer += bytes(align(len(buffer)) - len(buffer))
+        buffer += arrays[name].tobytes()
+    return bytes(buffer)
+
+
+def compile_file(repository, name: str) -> str:
+    """Compiles data/<name>.json next to the other compiled levels. Returns the path written to."""
+    path = repository.compiled_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = compile_level(repository.get(name), repository.templates())
+    with open(f'{path}.tmp', 'wb') as compiled_file:
+        compiled_file.write(data)
+    os.replace(f'{path}.tmp', path)
+    return path
+
+
+if __name__ == '__main__':
+    from repository import levels
+    parser = argparse.ArgumentParser(description='Compile level files in to their binary form.')
+    parser.add_argument('names', nargs='*', help='Levels to compile, every level in data/ if none are given')
+    args = parser.parse_args()
+
+    names = args.names or levels.level_names()
+    for level_name in names:
+        try:
+            written = compile_file(levels, level_name)
+        except (CompileError, KeyError, ValueError, TypeError) as error:
+            print(f'{level_name}: not compiled, {error}')
+            continue
+        print(f'{level_name}: {os.path.getsize(levels.path(level_name))} -> {os.path.getsize(written)} bytes')
@@ -0,0 +1,311 @@
+"""Estimates how hard levels are by playing through them lots of times the way an imperfect player would.
+
+Each run follows the fastest route through the level (found by solver.py), deciding what to do every few ticks
+like a player reacting to the screen: it heads for a point a bit further along the route, aims a little off,
+keeps away from enemies it sees coming and now and then presses the wrong keys. Reaction time, aim, caution and
+mistakes are picked at random for every run, so the runs stand in for a range of players.
+Runs are played headlessly with the Simulation, spread over a pool of processes. Every level gets the share of runs
+which completed it, how often they died, how long completing it took and a suggested difficulty tier,
+and every campaign the median tier of its levels next to the difficulty it has now.
+
+    python difficulty.py
+    python difficulty.py level1-5 level2-1 --runs 1000 --processes 8
+    python difficulty.py --save ratings.json"""
+import argparse
+import functools
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import time
+import numpy as np
+import pygame
+from replay import Replay
+from repository import levels
+from simulation import Simulation
+from solver import MOVES, SOLVED, enemy_positions, solve_level
+
+SOLVED_FOLDER = os.path.join('replays', 'solved')
+WINDOW = 120  # Positions of the route around the player looked through to see how far along it is
+TIERS = ((0.5, 0), (2, 1), (5, 2), (12, 3))  # (most deaths a completion, tier), any more is tier 4
+TIER_NAMES = {-1: 'tutorial', 0: 'easy', 1: 'medium', 2: 'hard', 3: 'expert', 4: 'special', 99: 'test'}
+
+
+def fastest_run(level_name: str, max_ticks: int=3600) -> Replay:
+    """The replay solver.py --save made for a level, solving it first if there isn't one.
+    None if the solver couldn't find a run."""
+    path = os.path.join(SOLVED_FOLDER, f'{level_name}.rpl')
+    if os.path.exists(path):
+        return Replay.load(path)
+    solution = solve_level(level_name, max_ticks)
+    if solution.status != SOLVED:
+        return None
+    solution.replay.save(path)
+    return solution.replay
+
+
+def route_of(replay: Replay) -> tuple:
+    """Every position the player goes through in a replay, in order, as a (positions, 2) array,
+    and (index of the position, 'coin' or 'key', index of it in the level) for everything picked up along the way.
+    Standing still is left out, bots go by where the enemies are instead of when the replay moved."""
+    with replay.simulation() as sim:
+        level = sim.level
+        positions = [(sim.player.x, sim.player.y)]
+        pickups = []
+        while not sim.completed and sim.ticks < replay.ticks:
+            coins = [coin.collected for coin in level.coins]
+            keys = [key.die for key in level.keys]
+            sim.advance(1)
+            pickups += [(len(positions) - 1, 'coin', i) for i, coin in enumerate(level.coins) if coin.collected and not coins[i]]
+            pickups += [(len(positions) - 1, 'key', i) for i, key in enumerate(level.keys) if key.die and not keys[i]]
+            if (sim.player.x, sim.player.y) != positions[-1]:
+                positions.append((sim.player.x, sim.player.y))
+    return np.array(positions), pickups
+
+
+@functools.lru_cache(maxsize=4)
+def foresee(level_name: str, ticks: int) -> np.ndarray:
+    """Where the enemies of a level are after each tick, see solver.enemy_positions. Kept for the next batch of the level."""
+    with Simulation(level_name) as sim:
+        return enemy_positions(sim.level.enemy_system, ticks)
+
+
+class Bot:
+    """Plays a Simulation by following a route, making the mistakes a person would.
+    All of its randomness comes from the seed, so a run can be played again."""
+    def __init__(self, sim: Simulation, route: tuple, enemies: np.ndarray, seed):
+        self.sim = sim
+        self.route, self.pickups = route  # See route_of
+        self.enemies = enemies  # Where enemies are after each tick, see foresee
+        self.radius = sim.level.enemy_system.radius
+        self.rng = random.Random(seed)
+        self.reaction = self.rng.randint(6, 20)  # Ticks between decisions
+        self.foresight = self.rng.randint(20, 90)  # Ticks past the next decision the player can tell where enemies will be
+        self.aim = self.rng.uniform(0, 10)  # Pixels the player aims off of the route by
+        self.caution = self.rng.uniform(0, 20)  # Pixels the player tries to keep between itself and enemies
+        self.mistakes = self.rng.uniform(0, 0.05)  # Chance of a decision being a random move
+        self.progress = 0  # Index of the route the player is closest to
+        self.furthest = 0
+        self.last = self.route[0], 0, 0  # Player position, ticks and deaths when the player was last located
+        self.held = set()
+        self.move = 0, 0
+        self.stuck = set()  # Moves which were held without the player going anywhere since it last moved
+
+        jumps = np.nonzero(np.abs(np.diff(self.route, axis=0)).max(axis=1) > sim.player.speed * 1.5)[0]
+        self.ends = np.full(len(self.route), len(self.route) - 1)  # Last index before the route gets teleported (dies or warps)
+        for start, end in zip(np.concatenate(([0], jumps + 1)), np.concatenate((jumps, [len(self.route) - 1]))):
+            self.ends[start:end + 1] = end
+
+    def __repr__(self):
+        return f'Bot(reaction {self.reaction}, foresight {self.foresight}, aim {self.aim:.1f}, caution {self.caution:.1f}, mistakes {self.mistakes:.2f})'
+
+    def locate(self, here: np.ndarray):
+        """Find how far along the route the player is, going by the part of the route around where it was
+        unless it got teleported (died or warped)."""
+        sim = self.sim
+        last, ticks, deaths = self.last
+        self.last = here, sim.ticks, sim.deaths
+        if sim.deaths == deaths and np.abs(here - last).max() <= sim.player.speed * (sim.ticks - ticks):
+            start = max(self.progress - WINDOW, 0)
+            stop = self.progress + WINDOW
+        else:  # Look through everything up to where the player has been
+            start, stop = 0, self.furthest + WINDOW
+        distances = np.hypot(*(self.route[start:stop] - here).T)
+        close = np.nonzero(distances <= distances.min() + sim.player.speed)[0]
+        self.progress = start + int(close[-1])  # Furthest along, routes can double back
+        self.furthest = max(self.furthest, self.progress)
+
+    def steer(self, here: np.ndarray, target: np.ndarray, wait: int) -> tuple:
+        """The move which gets closest to target in wait ticks, as long as there's some move to make after it
+        which keeps the player more than caution away from every enemy for foresight ticks more, or failing that
+        out of their reach. Walls stop the player the way they push it back in the game.
+        If there's no such move, the one that keeps furthest from enemies.
+        Moves which didn't get the player anywhere are left for last, so it doesn't keep pushing in to a corner."""
+        player = self.sim.player
+        width, height = player.bbox_size
+        steps = np.array(MOVES, dtype=float) * player.speed
+        ticks = np.union1d(np.linspace(0, wait + self.foresight, 16).round().astype(int), [wait])
+        first = np.minimum(ticks, wait)
+        then = ticks - first
+        plans = (here + steps[:, None, None, :] * first[None, None, :, None]
+                 + steps[None, :, None, :] * then[None, None, :, None]).reshape(len(MOVES) ** 2, len(ticks), 2)  # (plan, tick, xy)
+
+        walls = np.array([(wall.crect.x, wall.crect.y, wall.crect.x + wall.crect.width, wall.crect.y + wall.crect.height)
+                          for wall in self.sim.level.walls if wall.collide]).reshape(-1, 4)
+        size = np.array((width, height))
+        centre = here + size / 2
+        overlapping = (here[0] < walls[:, 2]) & (here[0] + width > walls[:, 0]) & (here[1] < walls[:, 3]) & (here[1] + height > walls[:, 1])
+        reach = np.abs(np.clip(centre, walls[:, :2], walls[:, 2:]) - centre)  # From the player's centre to the closest point of each wall
+        pushes = (reach[:, 1] > reach[:, 0]).astype(int)  # Axis Player.rect_intersect pushes the player out of a wall on
+        for axis, other in ((0, 1), (1, 0)):  # Walls stop movement along one axis, the player slides along them on the other
+            across = (here[other] < walls[:, other + 2]) & (here[other] + size[other] > walls[:, other]) & (~overlapping | (pushes == axis))
+            before = walls[:, axis] + walls[:, axis + 2] < 2 * centre[axis]
+            low = np.where(overlapping, here[axis], walls[:, axis + 2])[across & before].max(initial=-np.inf)
+            high = np.where(overlapping, here[axis], walls[:, axis] - size[axis])[across & ~before].min(initial=np.inf)
+            plans[..., axis] = np.clip(plans[..., axis], low, high)
+
+        moved = plans[::len(MOVES), ticks.searchsorted(wait)]  # Where each first move gets to
+        closest = np.hypot(*(moved - target).T)
+        closest[[MOVES.index(move) for move in self.stuck]] = np.inf
+        if not len(self.radius):
+            return MOVES[int(closest.argmin())]
+        seen = self.enemies[np.minimum(self.sim.ticks + ticks + 1, len(self.enemies) - 1)]  # (tick, enemy, xy)
+        nearest = np.clip(seen, plans[:, :, None, :], plans[:, :, None, :] + (width, height))
+        gaps = (np.hypot(*np.moveaxis(seen - nearest, -1, 0)) - self.radius).min(axis=(1, 2)).reshape(len(MOVES), len(MOVES)).max(axis=1)
+        for margin in (self.caution, 0):
+            safe = gaps > margin
+            if safe.any():
+                return MOVES[int(np.where(safe, closest, np.inf).argmin())]
+        return MOVES[int(gaps.argmax())]
+
+    def hold(self, move: tuple):
+        """Press and release keys so that only the ones for this move are held."""
+        self.move = dx, dy = move
+        want = set()
+        if dx:
+            want.add(pygame.K_d if dx > 0 else pygame.K_a)
+        if dy:
+            want.add(pygame.K_s if dy > 0 else pygame.K_w)
+        for key in self.held - want:
+            self.sim.release(key)
+        for key in want - self.held:
+            self.sim.press(key)
+        self.held = want
+
+    def decide(self) -> int:
+        """Pick what to hold down next. Returns the ticks until the next decision, less when close to where the player is heading."""
+        player = self.sim.player
+        here = np.array((player.x, player.y))
+        if self.held and (here == self.last[0]).all():
+            self.stuck.add(self.move)
+        else:
+            self.stuck.clear()
+        self.locate(here)
+        level = self.sim.level
+        missing = [index for index, kind, i in self.pickups if not (level.coins[i].collected if kind == 'coin' else level.keys[i].die)]
+        target = self.route[min(self.progress + self.reaction, self.ends[self.progress], min(missing, default=len(self.route)))]
+        wait = max(round(self.rng.gauss(self.reaction, self.reaction / 4)), 1)
+        wait = min(wait, max(math.ceil(np.abs(target - here).max() / player.speed), 1))  # Tapping to get somewhere exactly
+        target = target + (self.rng.gauss(0, self.aim), self.rng.gauss(0, self.aim))
+        if self.rng.random() < self.mistakes:
+            self.hold(self.rng.choice(MOVES))
+        else:
+            self.hold(self.steer(here, target, wait))
+        return wait
+
+    def play(self, max_ticks: int) -> tuple:
+        """Play until the level is completed or max_ticks have passed. Returns (completed, ticks, deaths)."""
+        sim = self.sim
+        while not sim.completed and sim.ticks < max_ticks:
+            wait = self.decide()
+            deaths = sim.deaths
+            for _ in range(min(wait, max_ticks - sim.ticks)):
+                sim.step()
+                if sim.deaths != deaths:  # Respawning gets the player's attention
+                    break
+        return sim.completed, sim.ticks, sim.deaths
+
+
+def play_batch(task: tuple) -> tuple:
+    """Plays (level name, route, seeds, max ticks), one run per seed. Returns the level name and (completed, ticks, deaths) of each run."""
+    level_name, route, seeds, max_ticks = task
+    enemies = foresee(level_name, max_ticks + 60)
+    runs = []
+    for seed in seeds:
+        with Simulation(level_name) as sim:  # Gives the level back to the pools for the next run
+            runs.append(Bot(sim, route, enemies, seed).play(max_ticks))
+    return level_name, runs
+
+
+def tier(deaths_per_completion: float) -> int:
+    if deaths_per_completion is None:
+        return 4
+    for most, level_tier in TIERS:
+        if deaths_per_completion <= most:
+            return level_tier
+    return 4
+
+
+def rate(fastest: int, results: list) -> dict:
+    """Sums up the runs of a level. Times are in seconds."""
+    times = sorted(ticks / 60 for completed, ticks, deaths in results if completed)
+    deaths = sum(deaths for completed, ticks, deaths in results)
+    played = sum(ticks for completed, ticks, deaths in results)
+    deciles = statistics.quantiles(times, n=10, method='inclusive') if len(times) > 1 else times * 9
+    rating = {'runs': len(results),
+              'completion': len(times) / len(results),
+              'deaths_per_run': deaths / len(results),
+              'deaths_per_minute': deaths / played * 3600 if played else 0,
+              'deaths_per_completion': deaths / len(times) if times else None,
+              'fastest': fastest / 60,
+              'p10': deciles[0] if times else None,
+              'p50': deciles[4] if times else None,
+              'p90': deciles[8] if times else None,
+              'ticks': played}
+    rating['tier'] = tier(rating['deaths_per_completion'])
+    return rating
+
+
+def estimate(names: list, runs: int=200, max_ticks: int=7200, batch: int=20, seed: int=0, processes: int=None) -> dict:
+    """Rates levels, see rate. Levels the solver can't find a run through are left out.
+    Prints each level as soon as all of its runs are done."""
+    with multiprocessing.Pool(processes) as pool:
+        replays = dict(zip(names, pool.map(fastest_run, names)))
+        routes = {name: route_of(replay) for name, replay in replays.items() if replay is not None}
+        for name in names:
+            if name not in routes:
+                print(f'{name}: no run found by the solver, skipped')
+
+        tasks = []
+        for name, route in routes.items():
+            for start in range(0, runs, batch):
+                seeds = [f'{seed}-{name}-{i}' for i in range(start, min(start + batch, runs))]
+                tasks.append((name, route, seeds, max_ticks))
+        results = {name: [] for name in routes}
+        ratings = {}
+        for name, batch_results in pool.imap_unordered(play_batch, tasks):
+            results[name] += batch_results
+            if len(results[name]) == runs:
+                ratings[name] = rating = rate(replays[name].ticks, results[name])
+                print(f'{name:<14}tier {rating["tier"]}  completed {rating["completion"]:>4.0%}  '
+                      f'deaths/run {rating["deaths_per_run"]:>6.2f}  deaths/min {rating["deaths_per_minute"]:>6.2f}  '
+                      f'time p10/p50/p90 ' + '/'.join('-' if rating[p] is None else f'{rating[p]:.1f}' for p in ('p10', 'p50', 'p90'))
+                      + f's (fastest {rating["fastest"]:.1f}s)')
+    return {name: ratings[name] for name in names if name in ratings}
+
+
+def campaign_tiers(ratings: dict) -> list:
+    """(campaign, its difficulty, median tier of its rated levels) for every campaign with a rated level."""
+    suggested = []
+    for campaign_name, campaign in levels.campaigns().items():
+        tiers = [ratings[name]['tier'] for name in campaign['levels'] if name in ratings]
+        if tiers:
+            suggested.append((campaign_name, campaign['difficulty'], round(statistics.median(tiers))))
+    return suggested
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rate how hard levels are by playing them with imperfect scripted players.')
+    parser.add_argument('names', nargs='*', help='Levels to rate, every campaign level if none are given')
+    parser.add_argument('--runs', type=int, default=200, help='Runs played through each level')
+    parser.add_argument('--max-ticks', type=int, default=7200, help='Ticks after which a run gives up')
+    parser.add_argument('--batch', type=int, default=20, help='Runs handed to a process at once')
+    parser.add_argument('--seed', type=int, default=0, help='Change to play different runs')
+    parser.add_argument('--processes', type=int, default=None, help='Processes to play on, the amount of CPUs if not given')
+    parser.add_argument('--save', help='Write the ratings to this json file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ratings = estimate(args.names or levels.campaign_levels(), args.runs, args.max_ticks, args.batch, args.seed, args.processes)
+    seconds = time.perf_counter() - start
+    ticks = sum(rating['ticks'] for rating in ratings.values())
+    print(f'{ticks} ticks in {seconds:.1f}s ({ticks / seconds * 60:,.0f} ticks a minute)')
+    for campaign_name, difficulty, suggested in campaign_tiers(ratings):
+        note = '' if suggested == difficulty or difficulty in (-1, 99) else '  <- differs'
+        print(f'{campaign_name}: difficulty {difficulty} ({TIER_NAMES.get(difficulty, "easy")}), '
+              f'levels rated {suggested} ({TIER_NAMES[suggested]}){note}')
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'runs': args.runs, 'max_ticks': args.max_ticks, 'seed': args.seed, 'levels': ratings}, file, indent=4)
@@ -5,12 +5,16 @@ print('Loading...')
 
 # import pygame
 import json
-import jsbeautifier  # Isn't necessary, just cleans up the json output of excess newlines
+import os
+import sys
 from base import *
 from shapes import Rectangle, Line, Text
 from ui import UIElement
-from level import Wall, Enemy
+from level import Wall, Enemy, Coin, Key
 from sprite_loader import get_images
+from camera import Camera
+from profiler import Profiler
+from level_writer import LevelSaver
 
 
 # FIRST INIT
@@ -28,9 +32,11 @@ pygame.display.set_caption(f'{caption} LEVEL EDITOR')
 bg_color = 80, 80, 80, 255
 gradient_color = 180, 180, 220, 255
 cam_x, cam_y = 0, 0
+camera = Camera(size)
 cam_vx, cam_vy = 0, 0
 g_mousepos_x, g_mousepos_y = 0, 0
 MODE = 1  # 1 for placing and remove tiles, 2 for walls, 3 for enemies, 4 for coins
+level_name = sys.argv[1] if len(sys.argv) > 1 else 'editor_level'  # Opened if it exists and exported to data/<level_name>.json
 
 tile_override_existing = False  # Ignores the check for existing tiles
 
@@ -69,7 +75,7 @@ print(tile_template_names)
 
 class Tile(Rectangle):
     def __init__(self, grid_x, grid_y, color: tuple):
-        super().__init__((grid_x * 50, 50, grid_y * 50, 50), color)
+        super().__init__((grid_x * 50, 50, grid_y * 50, 50), color, shared=True)
         self.gx = grid_x
         self.gy = grid_y
         self.end = False
@@ -79,6 +85,7 @@ class Tile(Rectangle):
         self.warp = False, 0, 0  # Does warp, warp X. warp Y
         self.reset_point = 0, 0
         self.template = ''
+        self.info = None  # Level json of opened tiles, written back as is
 
     def __repr__(self):
         return f'Tile({self.gx, self.gy}, {self.color})'
@@ -92,174 +99,456 @@ class Tile(Rectangle):
         self.x, self.y = gx * 50, gy * 50
 
 
+SECTIONS = 'tiles', 'walls', 'enemies', 'coins', 'keys'  # Parts of a level file built from what's in the editor
+POSITIONS = 'x', 'y', 'sx', 'sy', 'ex', 'ey', 'newx', 'newy', 'warpx', 'warpy'  # Keys in level json which are positions
+
+
+def shift_info(info: dict, dx: int, dy: int) -> dict:
+    """A copy of a thing's level json with every position in it moved, or the same dict if it has no positions."""
+    if not any(key in info for key in POSITIONS + ('path', 'pivot')):
+        return info
+    info = dict(info)
+    for key in POSITIONS:
+        if key in info:
+            info[key] += dx if key.endswith('x') else dy
+    if 'path' in info:
+        info['path'] = [[x + dx, y + dy] for x, y in info['path']]
+    if info.get('pivot'):
+        info['pivot'] = [info['pivot'][0] + dx, info['pivot'][1] + dy]
+    return info
+
+
+# UNDO
+# Commands only keep what changed. Tiles are kept as their state: None for no tile, the template name of painted tiles
+# or the level json of opened ones, and walls, enemies, coins and keys as their level json, all shared instead of copied.
+# Centering the level on export isn't a command, it moves what the commands kept along with the level instead.
+
+
+def shift_tiles(tiles: dict, dx: int, dy: int) -> dict:
+    """A copy of a (gx, gy): value dict moved by dx and dy pixels, with tile states (or tuples of them) moved too."""
+    def shift_state(state):
+        if isinstance(state, tuple):
+            return tuple(shift_state(part) for part in state)
+        return shift_info(state, dx, dy) if isinstance(state, dict) else state
+    return {(gx + dx // 50, gy + dy // 50): shift_state(value) for (gx, gy), value in tiles.items()}
+
+
+class TileStroke:
+    """Tiles changed by one click or one drag of the mouse."""
+    def __init__(self):
+        self.changes = {}  # (gx, gy): (state before, state after)
+
+    def __repr__(self):
+        return f'TileStroke({len(self.changes)} tiles)'
+
+    def add(self, g_pos: tuple, before, after):
+        change = self.changes.get(g_pos)
+        if change is not None:  # Painted over again in the same stroke, only the first before matters
+            before = change[0]
+        self.changes[g_pos] = before, after
+
+    def undo(self, level):
+        for g_pos, (before, after) in self.changes.items():
+            level.set_tile(g_pos, before)
+
+    def redo(self, level):
+        for g_pos, (before, after) in self.changes.items():
+            level.set_tile(g_pos, after)
+
+    def move(self, dx: int, dy: int):
+        self.changes = shift_tiles(self.changes, dx, dy)
+
+
+class ThingChange:
+    """A wall, enemy, coin or key added to or removed from a section at index."""
+    def __init__(self, section: str, index: int, info: dict, added: bool):
+        self.section = section
+        self.index = index
+        self.info = info
+        self.added = added
+
+    def __repr__(self):
+        return f'ThingChange({self.section}, {self.index}, added={self.added})'
+
+    def undo(self, level):
+        if self.added:
+            level.delete_thing(self.section, self.index)
+        else:
+            level.insert_thing(self.section, self.index, self.info)
+
+    def redo(self, level):
+        if self.added:
+            level.insert_thing(self.section, self.index, self.info)
+        else:
+            level.delete_thing(self.section, self.index)
+
+    def move(self, dx: int, dy: int):
+        self.info = shift_info(self.info, dx, dy)
+
+
+class LevelReset:
+    """Everything destroyed at once."""
+    def __init__(self, level):
+        self.tiles = {g_pos: level.tile_state(g_pos) for g_pos in list(level.tiles) + list(level.unbuilt)}
+        self.things = {section: [thing.info for thing in getattr(level, section)] for section in SECTIONS[1:]}
+
+    def __repr__(self):
+        return f'LevelReset({len(self.tiles)} tiles)'
+
+    def undo(self, level):
+        for g_pos, state in self.tiles.items():
+            if isinstance(state, dict):  # Opened tiles go back to being made once they're on screen
+                level.unbuilt[g_pos] = state
+            else:
+                level.set_tile(g_pos, state)
+        level.view = None
+        for section, infos in self.things.items():
+            for info in infos:
+                level.insert_thing(section, len(getattr(level, section)), info)
+
+    def redo(self, level):
+        level.clear()
+
+    def move(self, dx: int, dy: int):
+        self.tiles = shift_tiles(self.tiles, dx, dy)
+        self.things = {section: [shift_info(info, dx, dy) for info in infos] for section, infos in self.things.items()}
+
+
+class History:
+    """Undo and redo for an EditorLevel. Tile changes made between begin and end are undone as one,
+    and nothing can be undone or redone until end."""
+    def __init__(self):
+        self.done = []
+        self.undone = []
+        self.stroke = None  # TileStroke being added to, between begin and end
+
+    def __repr__(self):
+        return f'History({len(self.done)} done, {len(self.undone)} undone)'
+
+    def record(self, command):
+        """Keep something which was just done, forgetting what was undone before it."""
+        self.done.append(command)
+        self.undone = []
+
+    def tile(self, g_pos: tuple, before, after):
+        if self.stroke is None:
+            stroke = TileStroke()
+            stroke.add(g_pos, before, after)
+            self.record(stroke)
+            return
+        if not self.stroke.changes:
+            self.record(self.stroke)
+        self.stroke.add(g_pos, before, after)
+
+    def begin(self):
+        self.stroke = TileStroke()
+
+    def end(self):
+        self.stroke = None
+
+    def move(self, dx: int, dy: int):
+        """The level moved by dx and dy pixels, move everything kept along with it."""
+        for command in self.done + self.undone:
+            command.move(dx, dy)
+
+    def undo(self, level) -> bool:
+        if self.stroke is not None or not self.done:
+            return False
+        command = self.done.pop()
+        command.undo(level)
+        self.undone.append(command)
+        return True
+
+    def redo(self, level) -> bool:
+        if self.stroke is not None or not self.undone:
+            return False
+        command = self.undone.pop()
+        command.redo(level)
+        self.done.append(command)
+        return True
+
+    def clear(self):
+        self.done = []
+        self.undone = []
+        self.stroke = None
+
+
 class EditorLevel(Base):
     def __init__(self):
         super().__init__()
-        self.tiles = []  # This self.tiles is a list of all tiles, not a list of X rows
+        self.tiles = {}  # (gx, gy): tile, so finding, adding and removing a tile doesn't go through every tile
+        self.unbuilt = {}  # (gx, gy): tile json of opened tiles which haven't been on screen yet, see build_view
+        self.view = None  # Grid area build_view last went over
         self.walls = []
         self.enemies = []
+        self.coins = []
+        self.keys = []
         self.level_data = {}  # Raw level data
+        self.changed = {'tiles', 'walls', 'enemies'}  # Sections export has to build again, the rest are written as opened
+        self.history = History()
+        self.saver = LevelSaver()  # Exports get written on a thread
+
+    def load(self, name: str):
+        """Open data/<name>.json in place of the current level. Tiles only get made once they're on screen.
+        Returns the spawn point."""
+        self.clear()
+        self.history.clear()
+        with open(f'data/{name}.json') as level_file:
+            self.level_data = json.loads(level_file.read())
+        data = self.level_data
+        for y, row in enumerate(data['tiles']):
+            for x, info in enumerate(row):
+                self.unbuilt[(x, y)] = info
+        for section in SECTIONS[1:]:
+            for info in data.get(section, []):
+                self.insert_thing(section, len(getattr(self, section)), info)
+        self.changed = set()
+        print(f'opened {name}: {len(self.unbuilt)} tiles, {len(self.walls)} walls, {len(self.enemies)} enemies, '
+              f'{len(self.coins)} coins, {len(self.keys)} keys')
+        return data.get('spawnx', 100), data.get('spawny', 100)
+
+    def make_tile(self, g_pos: tuple, template: str, info: dict=None) -> Tile:
+        new_tile = Tile(*g_pos, (0, 0, 0))
+        template_info = tile_templates.get(template, False)
+        if template_info:
+            new_tile.set_color(template_info.get('color', (255, 0, 255)))
+            new_tile.nil = template_info.get('nil', False)
+            new_tile.checkpoint = template_info.get('checkpoint', False)
+        if info is not None and 'color' in info:
+            new_tile.set_color(info['color'])
+        if new_tile.nil:
+            new_tile.set_color((50, 200, 120))
+        add_to_drawn('bg', new_tile)
+        self.tiles[g_pos] = new_tile
+        new_tile.template = template
+        new_tile.info = info
+        return new_tile
+
+    def tile_state(self, g_pos: tuple):
+        """What's at a grid position, as kept by the history: None, a painted tile's template or an opened tile's json."""
+        tile = self.tiles.get(g_pos)
+        if tile is None:
+            return self.unbuilt.get(g_pos)
+        return tile.template if tile.info is None else tile.info
+
+    def set_tile(self, g_pos: tuple, state):
+        """Put a tile state (see tile_state) at a grid position, without it going in the history."""
+        tile = self.tiles.pop(g_pos, None)
+        if tile is not None:
+            tile.die = True
+        self.unbuilt.pop(g_pos, None)
+        if isinstance(state, dict):
+            self.make_tile(g_pos, state.get('template', ''), state)
+        elif state is not None:
+            self.make_tile(g_pos, state)
+        self.changed.add('tiles')
 
     def add_tile(self, g_pos: tuple, template: str='empty'):
-        if not self.get_tile(*g_pos):
-            print(f'tile added: {template}')
-            new_tile = Tile(*g_pos, (0, 0, 0))
-            template_info = tile_templates.get(template, False)
-            if template_info:
-                new_tile.set_color(template_info.get('color', (255, 0, 255)))
-                new_tile.nil = template_info.get('nil', False)
-                new_tile.checkpoint = template_info.get('checkpoint', False)
-            if new_tile.nil:
-                new_tile.set_color((50, 200, 120))
-            add_to_drawn('bg', new_tile)
-            self.tiles.append(new_tile)
-            new_tile.template = template
-        elif tile_override_existing:
+        existing = self.get_tile(*g_pos)
+        if existing is not None:
+            if not tile_override_existing or existing.template == template:
+                return
             print(f'tile override: {template}')
-            self.remove_tile(*g_pos)
-            new_tile = Tile(*g_pos, (0, 0, 0))
-            template_info = tile_templates.get(template, False)
-            if template_info:
-                new_tile.set_color(template_info.get('color', (255, 0, 255)))
-                new_tile.nil = template_info.get('nil', False)
-            if new_tile.nil:
-                new_tile.set_color((50, 200, 120))
-            add_to_drawn('bg', new_tile)
-            self.tiles.append(new_tile)
-            new_tile.template = template
+        else:
+            print(f'tile added: {template}')
+        before = self.tile_state(g_pos)
+        self.set_tile(g_pos, template)
+        self.history.tile(g_pos, before, template)
+
+    def build_view(self, rect: tuple):
+        """Make the opened tiles which are in rect (world x, y, width, height)."""
+        if not self.unbuilt:
+            return
+        x, y, width, height = rect
+        view = int(x // 50), int(y // 50), int((x + width) // 50), int((y + height) // 50)
+        if view == self.view:
+            return
+        self.view = view
+        for gy in range(view[1], view[3] + 1):
+            for gx in range(view[0], view[2] + 1):
+                info = self.unbuilt.pop((gx, gy), None)
+                if info is not None:
+                    self.make_tile((gx, gy), info.get('template', ''), info)
+
+    def insert_thing(self, section: str, index: int, info: dict):
+        """Make a wall, enemy, coin or key from its level json, without it going in the history."""
+        if section == 'walls':
+            thing = Wall((info['sx'], info['sy']), (info['ex'], info['ey']), info.get('color', BLACK), 6,
+                         info.get('axis', 'xy'), associate=info.get('id', None))
+        elif section == 'enemies':
+            thing = Enemy((info['x'], info['y']), info.get('speed', 0), [tuple(point) for point in info.get('path', [])],
+                          info.get('color', BLUE_ENEMY))
+            if info.get('pivot'):
+                thing.pivot = tuple(info['pivot'])
+                thing.pivot_angle += info.get('angle', 0)
+            thing.move = False
+        elif section == 'coins':
+            thing = Coin((info['x'], info['y']))
+        else:
+            thing = Key((info['x'], info['y']), info['id'], info.get('color', (255, 255, 255)))
+        thing.info = info
+        getattr(self, section).insert(index, thing)
+        add_to_drawn('tg', thing)
+        self.changed.add(section)
+
+    def delete_thing(self, section: str, index: int) -> dict:
+        """Remove a wall, enemy, coin or key without it going in the history. Returns its level json."""
+        thing = getattr(self, section).pop(index)
+        thing.die = True
+        self.changed.add(section)
+        return thing.info
 
     def add_wall(self, x: int, y: int, ex: int, ey: int):
         """Create a wall from start x and y to ending x and y."""
         if x == ex and fixup:
             y += 6
             ey -= 6
-        new_wall = Wall((x, y), (ex, ey))
-        self.walls.append(new_wall)
-        add_to_drawn('tg', new_wall)
+        info = {'sx': x, 'sy': y, 'ex': ex, 'ey': ey}
+        self.insert_thing('walls', len(self.walls), info)
+        self.history.record(ThingChange('walls', len(self.walls) - 1, info, True))
 
     def add_enemy(self, x: int, y: int, speed: int, path: list=[]):
         """Create an enemy with a path."""
-        new_enemy = Enemy((x, y), speed, path)
-        new_enemy.move = False
-        self.enemies.append(new_enemy)
-        add_to_drawn('tg', new_enemy)
+        info = {'x': x, 'y': y, 'speed': speed, 'path': [list(point) for point in path]}
+        self.insert_thing('enemies', len(self.enemies), info)
+        self.history.record(ThingChange('enemies', len(self.enemies) - 1, info, True))
 
     def enable_enemies(self):
         """Allow all enemies to move"""
         for enemy in self.enemies:
             enemy.move = True
 
+    def move_all(self, dx: int, dy: int):
+        """Move everything by dx and dy pixels, which have to be whole tiles. The spawn point moves along."""
+        global spawn_x, spawn_y
+        spawn_x += dx
+        spawn_y += dy
+        gdx, gdy = dx // 50, dy // 50
+        for tile in self.tiles.values():
+            tile.set_position(tile.gx + gdx, tile.gy + gdy)
+            if tile.info is not None:
+                tile.info = shift_info(tile.info, dx, dy)
+        self.tiles = {(tile.gx, tile.gy): tile for tile in self.tiles.values()}
+        self.unbuilt = {(gx + gdx, gy + gdy): shift_info(info, dx, dy) for (gx, gy), info in self.unbuilt.items()}
+        self.view = None
+        for wall in self.walls:
+            start = wall.cstart[0] + dx, wall.cstart[1] + dy
+            end = wall.cdest[0] + dx, wall.cdest[1] + dy
+            wall.cstart, wall.cdest = start, end
+            wall.set_position(start[0], start[1], end[0], end[1])
+        for enemy in self.enemies:
+            enemy.path = [(x + dx, y + dy) for x, y in enemy.path]
+            enemy.x += dx
+            enemy.y += dy
+            enemy.newx += dx
+            enemy.newy += dy
+            if enemy.pivot:
+                enemy.pivot = enemy.pivot[0] + dx, enemy.pivot[1] + dy
+        for thing in self.coins + self.keys:
+            thing.x += dx
+            thing.y += dy
+        for thing in self.walls + self.enemies + self.coins + self.keys:
+            thing.info = shift_info(thing.info, dx, dy)
+        self.changed.update(section for section in SECTIONS if section in self.level_data or getattr(self, section))
+
     def export(self, name: str):
-        """Export level info to a json file"""
-        if self.tiles == []:  # Avoid crash
+        """Export level info to data/<name>.json. The file gets written in the background.
+        Only the sections which changed since the level was opened get built again."""
+        if not self.tiles and not self.unbuilt:  # Avoid crash
             return False
 
-        xs = [tile.gx for tile in self.tiles]
-        ys = [tile.gy for tile in self.tiles]
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
+        min_x, max_x, min_y, max_y = self.bounds()
         size_x, size_y = max_x - min_x + 1, max_y - min_y + 1
         origin_x, origin_y = 0 - min_x, 0 - min_y  # Difference in tile x to origin x in grid space
-        spawnx, spawny = spawn_x + origin_x * 50, spawn_y + origin_x * 50
-        print(size_x, size_y, origin_x, origin_y)
-
-        for tile in self.tiles:  # Center everything to the origin
-            tile.set_position(tile.gx + origin_x, tile.gy + origin_y)
-        new_walls = []  # Walls for json
-        for wall in self.walls:
-            start = wall.cstart[0] + origin_x * 50, wall.cstart[1] + origin_y * 50
-            end = wall.cdest[0] + origin_x * 50, wall.cdest[1] + origin_y * 50
-            wall.cstart, wall.cdest = start, end
-            wall.set_position(start[0], start[1], end[0], end[1])
-            info = {'sx': start[0], 'sy': start[1], 'ex': end[0], 'ey': end[1]}
-            new_walls.append(info)
-        new_enemies = []  # enemies for json
-        for enemy in self.enemies:
-            new_path = []
-            for path_point in enemy.path:
-                x, y = path_point
-                new_path.append((x + origin_x * 50, y + origin_y * 50))
-            enemy.path = new_path
-            enemy.x += origin_x * 50
-            enemy.y += origin_y * 50
-            enemy.newx += origin_x * 50
-            enemy.newy += origin_y * 50
-            info = {'x': enemy.x, 'y': enemy.y, 'speed': enemy.speed, 'path': new_path}
-            new_enemies.append(info)
-
-        sorted_tiles = sorted(self.tiles, key=lambda tile: (tile.y, tile.x))  # arbitrarily sorted x first, then y
-        new_tiles = []  # correctly sorted tiles for json.
-        # print(sorted_tiles)
-        for y in range(0, size_y):
-            x_row = []
-            for x in range(0, size_x):
-                try:
-                    real_tile = self.get_tile(x, y)
-                    if real_tile:
-                        selected_tile = sorted_tiles[x + y * size_x]
-                        info = {"template": selected_tile.template}
-                        if selected_tile.checkpoint:
-                            info['newx'] = spawnx
-                            info['newy'] = spawny
-                        x_row.append(info)
+        print(size_x, size_y, origin_x, origin_y, sorted(self.changed))
+
+        if origin_x != 0 or origin_y != 0:  # Center everything to the origin
+            self.move_all(origin_x * 50, origin_y * 50)
+            self.history.move(origin_x * 50, origin_y * 50)
+
+        if 'tiles' in self.changed:
+            new_tiles = []  # Rows of tiles for json, gaps filled with empty tiles
+            for y in range(0, size_y):
+                x_row = []
+                for x in range(0, size_x):
+                    tile = self.tiles.get((x, y))
+                    if tile is None:
+                        x_row.append(self.unbuilt.get((x, y), {"template": "empty"}))
+                    elif tile.info is not None:
+                        x_row.append(tile.info)
                     else:
-                        x_row.append({"template": "empty"})
-                except IndexError:
-                    x_row.append({"template": "empty"})
-            new_tiles.append(x_row)
-        for row in new_tiles:
-            print(row)
-        blurb = 'empty'
-        level_centered = True
-        next_level = False
-        self.level_data['blurb'] = blurb
-        self.level_data['next_level'] = next_level
-        self.level_data['centered'] = level_centered
-        self.level_data['spawnx'], self.level_data['spawny'] = spawnx, spawny
-        self.level_data['tiles'] = new_tiles
-        self.level_data['walls'] = new_walls
-        self.level_data['enemies'] = new_enemies
-        with open('data/editor_level.json', 'w') as empty_file:
-            data = json.dumps(self.level_data, indent=2)
-            options = jsbeautifier.default_options()
-            options.indent_size = 2
-            empty_file.write(jsbeautifier.beautify(data, options))
+                        info = {"template": tile.template}
+                        if tile.checkpoint:
+                            info['newx'] = spawn_x
+                            info['newy'] = spawn_y
+                        x_row.append(info)
+                new_tiles.append(x_row)
+            self.level_data['tiles'] = new_tiles
+        for section in SECTIONS[1:]:
+            if section in self.changed:
+                self.level_data[section] = [thing.info for thing in getattr(self, section)]
+        self.changed = set()
+        self.level_data.setdefault('blurb', 'empty')
+        self.level_data.setdefault('next_level', False)
+        self.level_data.setdefault('centered', True)
+        self.level_data['spawnx'], self.level_data['spawny'] = spawn_x, spawn_y
+        self.saver.save(f'data/{name}.json', dict(self.level_data))  # A copy, the next export changes level_data
 
     def get_tile(self, gx: int, gy: int):
-        """Gets a tile at the specified GX and GY. If none exist, returns None."""
-        for tile in self.tiles:
-            if tile.gx == gx and tile.gy == gy:
-                return tile
-        return None
+        """Gets a tile at the specified GX and GY, making it if it was opened but not made yet. If none exist, returns None."""
+        tile = self.tiles.get((gx, gy))
+        if tile is None and (gx, gy) in self.unbuilt:
+            info = self.unbuilt.pop((gx, gy))
+            tile = self.make_tile((gx, gy), info.get('template', ''), info)
+        return tile
 
     def remove_tile(self, gx: int, gy: int):
-        for i, tile in enumerate(self.tiles):
-            if tile.gx == gx and tile.gy == gy:
-                tile = self.tiles.pop(i)
-                tile.die = True
+        before = self.tile_state((gx, gy))
+        if before is not None:
+            self.set_tile((gx, gy), None)
+            self.history.tile((gx, gy), before, None)
+
+    def bounds(self) -> tuple:
+        """Smallest and largest GX, then smallest and largest GY of the tiles, made or not."""
+        xs = [gx for gx, gy in self.tiles] + [gx for gx, gy in self.unbuilt]
+        ys = [gy for gx, gy in self.tiles] + [gy for gx, gy in self.unbuilt]
+        return min(xs), max(xs), min(ys), max(ys)
 
     def remove_wall(self):
-        """Will only remove the wall at the top of the list. Essentially an undo function for walls."""
+        """Will only remove the wall at the top of the list."""
         if len(self.walls) > 0:
-            wall = self.walls.pop(len(self.walls) - 1)
-            wall.die = True
+            index = len(self.walls) - 1
+            self.history.record(ThingChange('walls', index, self.delete_thing('walls', index), False))
 
     def remove_enemy(self):
         if len(self.enemies) > 0:
-            enemy = self.enemies.pop(len(self.enemies) - 1)
-            enemy.die = True
+            index = len(self.enemies) - 1
+            self.history.record(ThingChange('enemies', index, self.delete_thing('enemies', index), False))
+
+    def undo(self):
+        if self.history.undo(self):
+            print(f'undone, {len(self.history.done)} left')
+
+    def redo(self):
+        if self.history.redo(self):
+            print(f'redone, {len(self.history.undone)} left')
 
     def reset(self):
-        """Destroy a level."""
-        for tile in self.tiles:
-            tile.die = True
-        for wall in self.walls:
-            wall.die = True
-        for enemy in self.enemies:
-            enemy.die = True
-        self.tiles = []
+        """Destroy a level. Can be undone."""
+        self.history.record(LevelReset(self))
+        self.clear()
+
+    def clear(self):
+        for thing in list(self.tiles.values()) + self.walls + self.enemies + self.coins + self.keys:
+            thing.die = True
+        self.tiles = {}
+        self.unbuilt = {}
+        self.view = None
         self.walls = []
         self.enemies = []
+        self.coins = []
+        self.keys = []
+        self.changed.update(section for section in SECTIONS if section in self.level_data)
 
 
 # FONTS
@@ -309,6 +598,10 @@ add_to_drawn('ui', editorui)
 add_to_drawn('ui', editorlevel)
 add_to_drawn('tg', temp_line)
 add_to_drawn('tg', temp_enemy_line)
+profiler = Profiler(pygame.font.Font('data/apple_kid.ttf', 30), position=(size[0] * 0.75, size[1] * 0.16))
+add_to_drawn('ui', profiler)
+if len(sys.argv) > 1 and os.path.exists(f'data/{level_name}.json'):
+    spawn_x, spawn_y = editorlevel.load(level_name)
 
 print('Done!')
 
@@ -316,7 +609,10 @@ print('Done!')
 while not closed:
 
     pygame.display.update()
+    profiler.mark('update')
+    profiler.end(drawn)
     dt = clock.tick_busy_loop()
+    profiler.begin()
     elapsed += dt
     mouse_pos = pygame.mouse.get_pos()
 
@@ -343,10 +639,12 @@ while not closed:
             if centered:
                 eex += 25
                 eey += 25
+    profiler.mark('tick')
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             closed = True
+            editorlevel.saver.wait()
             pygame.quit()
             quit()
 
@@ -354,6 +652,7 @@ while not closed:
             if event.button == 1:
                 mousedown = True
                 if MODE == 1:
+                    editorlevel.history.begin()  # Everything painted until the button is let go is undone at once
                     editorlevel.add_tile((g_mousepos_x, g_mousepos_y), using_tile)
                 elif MODE == 2:
                     if wall_starting:
@@ -394,6 +693,7 @@ while not closed:
             elif event.button == 3:
                 rightmousedown = True
                 if MODE == 1:
+                    editorlevel.history.begin()
                     editorlevel.remove_tile(g_mousepos_x, g_mousepos_y)
                 elif MODE == 2:
                     editorlevel.remove_wall()
@@ -413,12 +713,15 @@ while not closed:
         elif event.type == pygame.MOUSEBUTTONUP:
             if event.button == 1:
                 mousedown = False
+                editorlevel.history.end()
             elif event.button == 3:
                 rightmousedown = False
+                editorlevel.history.end()
 
         elif event.type == pygame.KEYDOWN:
             if event.key == pygame.K_ESCAPE:
                 closed = True
+                editorlevel.saver.wait()
                 pygame.quit()
                 quit()
             if event.key == pygame.K_w:
@@ -453,7 +756,7 @@ while not closed:
                 else:
                     centered = True
             elif event.key == pygame.K_r:
-                editorlevel.export('editor_level')
+                editorlevel.export(level_name)
             elif event.key == pygame.K_o:
                 if tile_override_existing:
                     tile_override_existing = False
@@ -469,6 +772,17 @@ while not closed:
                 if centered:
                     spawn_x += 25
                     spawn_y += 25
+            elif event.key == pygame.K_F3:
+                profiler.hide = not profiler.hide
+            elif event.key == pygame.K_F4:
+                profiler.export('editor', drawn)
+            elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                if event.mod & pygame.KMOD_SHIFT:
+                    editorlevel.redo()
+                else:
+                    editorlevel.undo()
+            elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+                editorlevel.redo()
 
         elif event.type == pygame.KEYUP:
             if event.key == pygame.K_w:
@@ -479,24 +793,31 @@ while not closed:
                 cam_vx = 0
             elif event.key == pygame.K_a:
                 cam_vx = 0
-
+    profiler.mark('events')
+
+    if elapsed >= game_speed:
+        drawn.compact()  # Dead things are only removed once a tick, all at once
+        for section, values in drawn.items():
+            for entity in values:
+                if entity.die is False:
+                    entity.tick()
+        profiler.mark('tick')
+    camera.move(cam_x, cam_y)
+    editorlevel.build_view(camera.rect)
     for section, values in drawn.items():
-        for i, entity in enumerate(values):
+        for entity in values:
             if entity.die is True:
-                remove_from_drawn(section, i)
-
-            if elapsed >= game_speed:
-                if section == 'collides':
-                    pass
-                entity.tick()
+                continue
 
             if section != 'ui':
-                entity.draw(screen, (cam_x, cam_y))
+                if camera.visible(entity):  # Off screen things don't get drawn
+                    entity.draw(screen, camera.offsets)
             else:
                 if isinstance(entity, UIElement):
                     entity.mouse_pos = mouse_pos
                     entity.mousedown = mousedown
                 entity.draw(screen, (0, 0))
+        profiler.mark(f'draw {section}')
 
     while elapsed >= game_speed:
         elapsed -= game_speed
@@ -506,4 +827,5 @@ while not closed:
         display.blit(scaled, (0, 0))
     else:
         display.blit(screen, (0, 0))
+    profiler.mark('blit')
 
@@ -4,10 +4,18 @@ print('Loading...')
 import pygame
 import os
 import json
+import threading
 from base import *
 from player import Player
-from level import Wall, Enemy, Level, Coin, Tile, Key
+from level import Wall, Enemy, Level, LevelLoader, Coin, Tile, Key
 from shapes import Text
+from collision import CollisionRegistry
+from camera import Camera
+from renderer import DirtyRenderer
+from scheduler import Scheduler, refresh_rate
+from profiler import Profiler
+from replay import Replay
+from repository import levels
 from ui import UIElement, SpriteButton, Button
 from sprite_loader import get_images
 
@@ -17,7 +25,6 @@ from sprite_loader import get_images
 pygame.init()
 pygame.mixer.init()
 
-clock = pygame.time.Clock()
 display = pygame.display.set_mode(size)
 screen = pygame.Surface(size, pygame.SRCALPHA)
 
@@ -27,6 +34,10 @@ pygame.display.set_caption(caption)
 bg_color = 180, 180, 180, 255
 gradient_color = 180, 180, 220, 255
 cam_x, cam_y = 0, 0
+camera = Camera(size)
+renderer = None  # Draws everything itself if dirty rects are on
+if dirty_rects and size_mult == (1, 1):  # Scaled output changes all of the display anyways
+    renderer = DirtyRenderer(display, screen, bg_color)
 
 player = Player((0, 0))
 player.speed = 2
@@ -46,6 +57,7 @@ level_loading_delay = -1
 next_level = 'editor_level'
 level = Level(next_level, def_font, (200, 200), True)
 level.end = True  # Start level loading immediately
+loader = LevelLoader(level)  # Builds the next level in the background while the blurb shows
 
 # SOUNDS
 sound_coin = pygame.mixer.Sound('sfx/coin_collect.wav')
@@ -60,7 +72,49 @@ pygame.mixer.music.set_volume(0.35)
 # STATS
 deaths = 0
 time = 0
-level_times = {}  # level name : completion time
+level_times = {}  # level name : completion time, from replays which have been verified
+recording = None  # Replay of the level currently being played
+level_ticks = 0  # Ticks played in the current level
+level_start_deaths = 0
+
+
+def check_run(replay: Replay):
+    """Save a finished run and keep its time if it verifies. Verifying plays the whole level again,
+    so this runs on a thread instead of holding up the level transition."""
+    replay.save()
+    if replay.verify():
+        level_times[replay.level_name] = replay.time
+
+
+# COLLISIONS
+
+
+def player_hit_enemy(player: Player, enemy: Enemy):
+    global deaths
+    if enemy.colliding(player.bg_rect):
+        deaths += 1
+        level.respawn(player)
+        sound_death.play()
+
+
+def player_hit_coin(player: Player, coin: Coin):
+    if coin.colliding(player.bg_rect):
+        level.collect_coin(coin)
+        sound_coin.play()
+
+
+def player_hit_key(player: Player, key: Key):
+    if key.within(player.bg_rect):
+        level.collect_key(key)
+        sound_key.play()
+
+
+collisions = CollisionRegistry()
+collisions.register(Player, Wall, lambda player, wall: player.rect_intersect(wall.crect))
+collisions.register(Player, Tile, Player.tile_interact)
+collisions.register(Player, Enemy, player_hit_enemy)
+collisions.register(Player, Coin, player_hit_coin)
+collisions.register(Player, Key, player_hit_key)
 
 # UI
 blurb = Text((size[0] / 2, size[1] / 2), BLACK, '', font_blurb, centered=True)
@@ -94,6 +148,8 @@ class MainMenu(UIElement):
 
     def start_playing(self):
         """Play button."""
+        global recording
+        recording = None  # The level gets restarted, so there's no run to keep
         level.unhide()
         level.end = True
         player.can_move = True
@@ -318,14 +374,11 @@ class LevelSelect(UIElement):
         global next_level, level_loading_delay
         self.dead = True
         name = self.levels[b_id + (self.level_page - 1) * 15]
-        next_level = name
+        next_level = name  # Gets built in the background while its blurb shows
         level.reset()
         level.end = True
-        level.load(name, def_font)
         level_loading_delay = -1
-        blurb.set_text(level.this_blurb)
-        a = player.bg_rect.width / 2
-        player.x, player.y = level.player_spawn[0] + level.ox - a, level.player_spawn[1] + level.oy - a
+        blurb.set_text(levels.blurb(name))
         main_menu.start_playing()
 
     def page_up(self):
@@ -391,6 +444,8 @@ main_menu = MainMenu()
 # main_menu.stop_playing()
 add_to_drawn('ui', main_menu)
 game_menu = GameMenu()
+if renderer is not None:
+    renderer.track(game_menu.text_time, game_menu.text_deaths)
 add_to_drawn('ui', game_menu)
 campaign_menu = CampaignSelect()
 add_to_drawn('ui', campaign_menu)
@@ -399,19 +454,62 @@ add_to_drawn('ui', level_menu)
 level_menu.readjust_ui()
 final_menu = FinalMenu()
 add_to_drawn('ui', final_menu)
+profiler = Profiler(pygame.font.Font('data/apple_kid.ttf', 30), position=(size[0] * 0.75, size[1] * 0.02))
+add_to_drawn('ui', profiler)
 
 print('Done!')
 
 
+scheduler = Scheduler(FPS, frame_rate or refresh_rate())
+update_rects = None  # Parts of the display changed by the last frame, None if all of it was
 while not closed:
 
-    pygame.display.update()
-    dt = clock.tick_busy_loop()
-    elapsed += dt
+    profiler.begin()
+    ticks = scheduler.advance()  # However many ticks fit in the time since the last frame, to keep up with real time
     mouse_pos = pygame.mouse.get_pos()
 
-    if elapsed >= game_speed:  # Do do once every tick for these in particular
-        screen.fill(bg_color)
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            closed = True
+            pygame.quit()
+            quit()
+
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 1:
+                mousedown = True
+            elif event.button == 3:
+                rightmousedown = True
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if event.button == 1:
+                mousedown = False
+            elif event.button == 3:
+                rightmousedown = False
+
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                closed = True
+                pygame.quit()
+                quit()
+            elif event.key == pygame.K_SPACE:
+                if level_loading_delay > 0:
+                    level_loading_delay = 1
+            elif event.key == pygame.K_F3:
+                profiler.hide = not profiler.hide
+            elif event.key == pygame.K_F4:
+                profiler.export('game', drawn, level=recording.level_name if recording else None)
+            player.key_down(event.key)
+            if recording is not None:
+                recording.record(level_ticks, event.key, True)
+
+        elif event.type == pygame.KEYUP:
+            player.key_up(event.key)
+            if recording is not None:
+                recording.record(level_ticks, event.key, False)
+    profiler.mark('events')
+
+    for _ in range(ticks):
+        player.remember()
         if main_menu.playing:
             if level.hidden is False:
                 time += 1000 / 60
@@ -425,7 +523,13 @@ while not closed:
                 player.bg_rect.x, player.bg_rect.y = -100, -100
                 level_loading_delay = 140
                 blurb.hide = False
+                if next_level:
+                    loader.start(next_level, def_font)
                 sound_win.play()
+                if recording is not None:
+                    recording.finish(level_ticks, deaths - level_start_deaths)
+                    threading.Thread(target=check_run, args=(recording,), daemon=True).start()
+                    recording = None
                 if not next_level:  # Last level gets completed (has 'false' as next_level)
                     pass
             if level_loading_delay > 0:  # Keep showing blurb
@@ -435,10 +539,14 @@ while not closed:
                 player.hide = False
                 a = player.bg_rect.width / 2
                 if next_level:  # Goto next level
-                    level.load(next_level, def_font)
+                    level.apply(loader.finish(next_level, def_font))
                     level.unhide()
+                    recording = Replay(next_level, (player.vx, player.vy), player.speed)
+                    level_ticks = 0
+                    level_start_deaths = deaths
                     next_level = level.next
                     player.x, player.y = level.player_spawn[0] + level.ox - a, level.player_spawn[1] + level.oy - a
+                    player.bg_rect.x, player.bg_rect.y = player.x, player.y
                 else:  # Goto main menu
                     main_menu.dead = False
                     game_menu.dead = True
@@ -446,104 +554,62 @@ while not closed:
                 blurb.set_text(level.blurb)
                 level_loading_delay = -1
                 level.end = False
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            closed = True
-            pygame.quit()
-            quit()
-
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if event.button == 1:
-                mousedown = True
-            elif event.button == 3:
-                rightmousedown = True
-
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if event.button == 1:
-                mousedown = False
-            elif event.button == 3:
-                rightmousedown = False
-
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                closed = True
-                pygame.quit()
-                quit()
-            elif event.key == pygame.K_SPACE:
-                if level_loading_delay > 0:
-                    level_loading_delay = 1
-            if player.can_move:
-                if event.key == pygame.K_w:
-                    player.vy -= player.speed
-                elif event.key == pygame.K_s:
-                    player.vy += player.speed
-                elif event.key == pygame.K_d:
-                    player.vx += player.speed
-                elif event.key == pygame.K_a:
-                    player.vx -= player.speed
-                elif event.key == pygame.K_F2:
-                    player.set_speed(4)
-
-        elif event.type == pygame.KEYUP:
-            if player.can_move:
-                if event.key == pygame.K_w:
-                    player.vy += player.speed
-                elif event.key == pygame.K_s:
-                    player.vy -= player.speed
-                elif event.key == pygame.K_d:
-                    player.vx -= player.speed
-                elif event.key == pygame.K_a:
-                    player.vx += player.speed
-
-    for section, values in drawn.items():
-        for i, entity in enumerate(values):
-            if entity.die is True:
-                remove_from_drawn(section, i)
-
-            if elapsed >= game_speed:
-                if section == 'collides':
-                    for o_i, o_entity in enumerate(values):
-                        if o_i != i:
-                            if isinstance(entity, Player) and isinstance(o_entity, Wall):
-                                player.rect_intersect(o_entity.crect)
-                            elif isinstance(entity, Player) and isinstance(o_entity, Tile):
-                                player.tile_interact(o_entity)
-                            elif isinstance(entity, Player) and isinstance(o_entity, Enemy):
-                                if o_entity.colliding(player.bg_rect):
-                                    deaths += 1
-                                    a = player.bg_rect.width / 2
-                                    player.x, player.y = level.player_spawn[0] + level.ox - a, level.player_spawn[1] + level.oy - a
-                                    sound_death.play()
-                                    for coin in level.coins:
-                                        if coin.collected and not coin.perm_collected:
-                                            coin.collected = False
-                                            level.coins_collected -= 1
-                            elif isinstance(entity, Player) and isinstance(o_entity, Coin):
-                                if o_entity.colliding(player.bg_rect):
-                                    o_entity.collected = True
-                                    level.coins_collected += 1
-                                    sound_coin.play()
-                            elif isinstance(entity, Player) and isinstance(o_entity, Key):
-                                if o_entity.within(player.bg_rect):
-                                    o_entity.die = True
-                                    level.unlock(o_entity)
-                                    sound_key.play()
+        level.tick()
+
+        drawn.compact()  # Dead things are only removed once a tick, all at once
+        for section, values in drawn.items():
+            for entity in values:
+                if entity.die is True:
+                    continue
+                if section == 'collides' and collisions.handles(entity):
+                    profiler.start_part()
+                    for o_entity in level.nearby(entity.bounds):  # Only check what's nearby
+                        collisions.dispatch(entity, o_entity)
+                    profiler.stop_part('collision')
                 entity.tick()
 
-            if section != 'ui':
-                entity.draw(screen, (cam_x, cam_y))
-            else:
-                if isinstance(entity, UIElement):
-                    entity.mouse_pos = mouse_pos
-                    entity.mousedown = mousedown
-                entity.draw(screen, (0, 0))
-
-    while elapsed >= game_speed:
-        elapsed -= game_speed
-
-    if size_mult[0] != 1 and size_mult[1] != 1:
-        scaled = pygame.transform.scale(screen, (round(size[0] * size_mult[0]), round(size[1] * size_mult[1])))
-        display.blit(scaled, (0, 0))
+        if recording is not None and not level.hidden:
+            level_ticks += 1
+    profiler.mark('tick')
+
+    camera.move(cam_x, cam_y)
+    player.interpolate(scheduler.alpha)  # Drawn part of the way to the next tick, so movement looks smooth at any frame rate
+    level.interpolate(scheduler.alpha)
+    for entity in drawn['ui']:
+        if isinstance(entity, UIElement):
+            entity.mouse_pos = mouse_pos
+            entity.mousedown = mousedown
+
+    if renderer is not None:
+        if not main_menu.playing or level.hidden:  # Menus and blurbs aren't watched, so they get repainted whole
+            renderer.invalidate()
+        update_rects = renderer.render(drawn, camera)
+        profiler.mark('render')
+    else:
+        screen.fill(bg_color)
+        for section, values in drawn.items():
+            for entity in values:
+                if entity.die is True:
+                    continue
+                if section != 'ui':
+                    if camera.visible(entity):  # Off screen things don't get drawn
+                        entity.draw(screen, camera.offsets)
+                else:
+                    entity.draw(screen, (0, 0))
+            profiler.mark(f'draw {section}')
+        if size_mult[0] != 1 and size_mult[1] != 1:
+            scaled = pygame.transform.scale(screen, (round(size[0] * size_mult[0]), round(size[1] * size_mult[1])))
+            display.blit(scaled, (0, 0))
+        else:
+            display.blit(screen, (0, 0))
+        profiler.mark('blit')
+    player.settle()  # Back to where they really are before the next tick
+    level.settle()
+
+    if update_rects is None:
+        pygame.display.update()
     else:
-        display.blit(screen, (0, 0))
+        pygame.display.update(update_rects)
+    profiler.mark('update')
+    profiler.end(drawn)
+    scheduler.wait()
@@ -2,14 +2,18 @@
 from base import *
 from shapes import Rectangle, Line, Circle, Text
 from sprites import Sprite, AnimSprite
-import json
+from collision import SpatialHash
+from repository import levels
 import pygame
+import numpy as np
 import math
+import threading
+from concurrent.futures import Future
 
 
 class Tile(Rectangle):
     def __init__(self, grid_x, grid_y, color: tuple, level):
-        super().__init__((grid_x * 50, 50, grid_y * 50, 50), color)
+        super().__init__((grid_x * 50, 50, grid_y * 50, 50), color, shared=True)
         self.gx = grid_x
         self.gy = grid_y
         self.end = False
@@ -52,6 +56,7 @@ class Wall(Line):
         self.hide = False
         self.collide = True
         self.id = associate
+        self.baked = False  # Drawn as part of a TileLayer instead of by itself
         super().__init__(start, end, color, width)
 
         half_width = self.width / 2
@@ -64,13 +69,17 @@ class Wall(Line):
         if height < 0:
             start = start[0], start[1] + height
             height = math.fabs(height)
-        self.crect = Rectangle((start[0], width, start[1], height), color)
+        self.crect = Rectangle((start[0], width, start[1], height), color, shared=associate is None)  # Key walls change alpha
 
     def __repr__(self):
         return f'Wall({self.start}, {self.dest})'
 
+    @property
+    def bounds(self) -> tuple:
+        return self.crect.bounds
+
     def draw(self, screen, offsets: tuple):
-        if self.hide is False:
+        if self.hide is False and self.baked is False:
             self.crect.draw(screen, offsets)
 
     def nearest_point(self, relative: tuple):
@@ -128,7 +137,7 @@ class Wall(Line):
         if height < 0:
             start = start[0], start[1] + height
             height = math.fabs(height)
-        self.crect = Rectangle((start[0], width, start[1], height), self.color)
+        self.crect = Rectangle((start[0], width, start[1], height), self.color, shared=self.id is None)
 
     def within(self, other: Rectangle):
         if self.collide:
@@ -152,6 +161,7 @@ class Enemy(Circle):
         self.vy = 0
         self.steps = 0  # Until next point
         self.move = True
+        self.system = None  # The EnemySystem moving this enemy, if any
 
         self.newx, self.newy = self.x, self.y
         self.pivot_angle = 0
@@ -168,6 +178,10 @@ class Enemy(Circle):
     def __repr__(self):
         return f'Enemy({self.x, self.y})'
 
+    @property
+    def bounds(self) -> tuple:
+        return self.newx - self.radius, self.newy - self.radius, self.radius * 2, self.radius * 2
+
     def angle_to(self, other) -> float:
         x = other[0] - self.x
         y = other[1] - self.y
@@ -216,6 +230,8 @@ class Enemy(Circle):
 
     def tick(self):
         super().tick()
+        if self.system is not None:  # Moved all at once by its system instead
+            return
         if self.hide is False and self.move:
             if self.path != []:
                 self.travel()
@@ -248,6 +264,142 @@ class Enemy(Circle):
         self.vy = vy
 
 
+class EnemySystem:
+    """Moves every enemy in a level at once.
+    Enemy state is kept in numpy arrays (one per value instead of one object per enemy)
+    so a tick is a handful of array operations no matter how many enemies there are.
+    Follows the same rules as Enemy.travel and Enemy.pivot_around. Enemies with move set to False stay put,
+    and paused (while the level is hidden) stops every enemy."""
+    def __init__(self, enemies: list):
+        self.enemies = enemies
+        self.paused = False
+        count = len(enemies)
+        self.pos = np.zeros((count, 2))  # Path position, or the point pivoted from
+        self.new = np.zeros((count, 2))  # Where the enemy actually is
+        self.vel = np.zeros((count, 2))
+        self.speed = np.zeros(count)
+        self.steps = np.zeros(count)  # Until next point
+        self.radius = np.zeros(count)
+        self.is_path = np.zeros(count, dtype=bool)
+        self.is_pivot = np.zeros(count, dtype=bool)
+        self.point_index = np.zeros(count, dtype=np.intp)
+        self.next_point = np.zeros((count, 2))
+        self.path_start = np.zeros(count, dtype=np.intp)  # Index of the first point in self.path_points
+        self.path_len = np.zeros(count, dtype=np.intp)
+        self.pivots = np.zeros((count, 2))
+        self.angles = np.zeros(count)  # Pivot angle, in degrees
+
+        path_points = []
+        for i, enemy in enumerate(enemies):
+            enemy.system = self
+            self.pos[i] = enemy.x, enemy.y
+            self.new[i] = enemy.newx, enemy.newy
+            self.vel[i] = enemy.vx, enemy.vy
+            self.speed[i] = enemy.speed
+            self.steps[i] = enemy.steps
+            self.radius[i] = enemy.radius
+            if enemy.path != []:
+                self.is_path[i] = True
+                self.point_index[i] = enemy.point_index
+                self.next_point[i] = enemy.next_point
+                self.path_start[i] = len(path_points)
+                self.path_len[i] = len(enemy.path)
+                path_points.extend(enemy.path)
+            elif enemy.pivot:
+                self.is_pivot[i] = True
+                self.pivots[i] = enemy.pivot
+                self.angles[i] = enemy.pivot_angle
+        self.path_points = np.array(path_points, dtype=float).reshape(-1, 2)
+        self.pivoting = np.nonzero(self.is_pivot)[0]
+        self.last = self.new.copy()  # Where enemies were before the current tick, see interpolate
+
+    def __repr__(self):
+        return f'EnemySystem({len(self.enemies)} enemies)'
+
+    def __len__(self) -> int:
+        return len(self.enemies)
+
+    def tick(self):
+        if not self.enemies:
+            return
+        np.copyto(self.last, self.new)
+        if self.paused:
+            return
+        moves = np.fromiter((enemy.move for enemy in self.enemies), bool, len(self.enemies))
+        if not moves.any():
+            return
+        self.travel(moves)
+        self.pivot_around(moves)
+        self.settle()
+
+    def interpolate(self, alpha: float):
+        """Draw enemies alpha (0 to 1) of the way from where they were before the last tick to where they are now.
+        Has to be undone with settle before the next tick."""
+        if not self.enemies:
+            return
+        between = self.last + (self.new - self.last) * alpha
+        for enemy, (x, y) in zip(self.enemies, between.tolist()):
+            enemy.newx, enemy.newy = x, y
+
+    def settle(self):
+        """Puts every enemy object where the arrays say it is."""
+        for enemy, (x, y) in zip(self.enemies, self.new.tolist()):
+            enemy.newx, enemy.newy = x, y
+
+    def travel(self, moves: np.ndarray):
+        """Moves path enemies towards their next point, or snaps them to it and sets up the next path.
+        Only enemies which are True in moves go anywhere."""
+        on_path = self.is_path & moves
+        moving = on_path & (self.steps > 0)
+        self.pos[moving] += self.vel[moving]
+        self.new[moving] = self.pos[moving]
+        self.steps[moving] -= 1
+
+        arrived = np.nonzero(on_path & ~moving)[0]
+        if len(arrived) == 0:
+            return
+        current = self.next_point[arrived]
+        self.pos[arrived] = current
+        index = self.point_index[arrived] + 1
+        index[index >= self.path_len[arrived]] = 0
+        self.point_index[arrived] = index
+
+        target = self.path_points[self.path_start[arrived] + index]
+        self.next_point[arrived] = target
+        delta = target - current
+        speed = self.speed[arrived]
+        with np.errstate(divide='ignore', invalid='ignore'):  # Enemies with no speed never get anywhere
+            self.steps[arrived] = np.hypot(delta[:, 0], delta[:, 1]) / speed
+        angle = np.arctan2(delta[:, 1], delta[:, 0])
+        self.vel[arrived, 0] = speed * np.cos(angle)
+        self.vel[arrived, 1] = speed * np.sin(angle)
+
+    def pivot_around(self, moves: np.ndarray):
+        """Rotates pivoting enemies which are True in moves around their pivot point."""
+        pivoting = self.pivoting[moves[self.pivoting]]
+        if len(pivoting) == 0:
+            return
+        angles = (self.angles[pivoting] + self.speed[pivoting] / 60) % 360
+        self.angles[pivoting] = angles
+        angle = np.radians(angles)
+        cos, sin = np.cos(angle), np.sin(angle)
+        pivot = self.pivots[pivoting]
+        offset = self.pos[pivoting] - pivot
+        x, y = offset[:, 0], offset[:, 1]
+        self.new[pivoting] = np.column_stack((x * cos - y * sin, x * sin + y * cos)) + pivot
+
+    def touching(self, bounds: tuple) -> list:
+        """Returns every enemy whose circle overlaps this x, y, width, height box."""
+        if not self.enemies:
+            return []
+        x, y, w, h = bounds
+        ex, ey = self.new[:, 0], self.new[:, 1]
+        dx = ex - np.minimum(np.maximum(ex, x), x + w)  # Distance to the closest point of the box
+        dy = ey - np.minimum(np.maximum(ey, y), y + h)
+        hits = np.nonzero(dx * dx + dy * dy <= self.radius * self.radius)[0]
+        return [self.enemies[i] for i in hits]
+
+
 class Coin(Circle):
     """Coin level object"""
     def __init__(self, position: tuple):
@@ -313,15 +465,37 @@ class PowerUp(Circle):
             self.scircle.draw(screen, offsets)
 
 
+key_images = {}  # color: key image recolored to that color. None holds the image as loaded
+
+
+def key_image(color: tuple):
+    """Returns the key image with any pure white pixels changed to a specific color.
+    The image is only loaded once, and only recolored once per color, so keys of the same color share one surface."""
+    color = tuple(color)
+    image = key_images.get(color)
+    if image is None:
+        base = key_images.get(None)
+        if base is None:
+            base = pygame.image.load('images/key.png')
+            if pygame.display.get_surface() is not None:  # Can't convert without a display
+                base = base.convert_alpha()
+            key_images[None] = base
+        image = base.copy()
+        pixels = pygame.surfarray.pixels3d(image)  # Locks the image until deleted
+        pixels[pixels.sum(axis=2, dtype=np.int32) == 765] = color
+        del pixels
+        key_images[color] = image
+    return image
+
+
 class Key(Sprite):
     """Key level object."""
     def __init__(self, pos: tuple, associate: int, color: tuple=BLACK):
-        super().__init__(pos, pygame.image.load('images/key.png').convert_alpha())
+        super().__init__(pos, key_image(color))
         self.x -= self.size[0] / 2
         self.y -= self.size[1] / 2
         self.id = associate  # Any walls with the same id will unlock when this key is grabbed
         self.color = color
-        self.set_color(color)
         self.hide = False
 
     def draw(self, screen, offsets: tuple):
@@ -330,13 +504,8 @@ class Key(Sprite):
 
     def set_color(self, color: tuple):
         """Changes any pure white pixels of this key to a specific color."""
-        r, g, b, = color
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                p_r, p_g, p_b, p_a = self.image.get_at((x, y))
-                total = sum([p_r, p_g, p_b])
-                if total == 765:
-                    self.image.set_at((x, y), pygame.Color(r, g, b, p_a))
+        self.color = color
+        self.image = key_image(color)
 
     def within(self, other: Rectangle):
         if self.collide:
@@ -351,12 +520,133 @@ class LevelObject(AnimSprite):
         super().__init__(coords, frames, delay, loop)
 
 
+class TileLayer(Base):
+    """All of a level's tiles and static walls pre-drawn on to a single surface,
+    so the whole layer costs one blit a frame instead of one per tile."""
+    def __init__(self, tiles: list, walls: list):
+        super().__init__()
+        self.tiles = tiles  # Rows of tiles
+        self.walls = walls
+        self.surf = None
+        self.x, self.y = 0, 0
+        self.width, self.height = 0, 0
+        self.hide = False
+        self.dirty = True  # Re-bake before the next draw
+
+    def __repr__(self):
+        return f'TileLayer(({self.x}, {self.y}), {self.width}x{self.height})'
+
+    @property
+    def bounds(self) -> tuple:
+        return self.x, self.y, self.width, self.height
+
+    def bake(self):
+        """Draw every non nil tile and baked wall to the layer surface."""
+        rects = [tile for row_y in self.tiles for tile in row_y if not tile.nil]
+        rects += [wall.crect for wall in self.walls if wall.baked]
+        self.dirty = False
+        if rects == []:
+            self.surf = None
+            return
+        self.x = math.floor(min(rect.x for rect in rects))
+        self.y = math.floor(min(rect.y for rect in rects))
+        self.width = math.ceil(max(rect.x + rect.width for rect in rects)) - self.x
+        self.height = math.ceil(max(rect.y + rect.height for rect in rects)) - self.y
+        self.surf = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+        for rect in rects:
+            rect.draw(self.surf, (self.x, self.y))
+
+    def draw(self, screen, offsets: tuple):
+        """Blits only the part of the layer which is on screen."""
+        if self.hide is False:
+            if self.dirty:
+                self.bake()
+            if self.surf is not None:
+                ox, oy = offsets
+                width, height = screen.get_size()
+                left, top = max(self.x, ox), max(self.y, oy)
+                right, bottom = min(self.x + self.width, ox + width), min(self.y + self.height, oy + height)
+                if right > left and bottom > top:
+                    screen.blit(self.surf, (left - ox, top - oy), (left - self.x, top - self.y, right - left, bottom - top))
+
+    def invalidate(self):
+        """Something baked in to the layer has changed."""
+        self.dirty = True
+
+
+tile_pool = Pool(Tile)  # Things from reset levels get reused by the next levels
+wall_pool = Pool(Wall)
+enemy_pool = Pool(Enemy)
+coin_pool = Pool(Coin)
+
+
+class PreparedLevel:
+    """Every object of a level built from its level file, waiting to be swapped in to a Level with Level.apply."""
+    def __init__(self, name: str):
+        self.name = name
+        self.ox, self.oy = 0, 0
+        self.size_x, self.size_y = 0, 0
+        self.tiles = []
+        self.important_tiles = []
+        self.walls = []
+        self.coins = []
+        self.enemies = []
+        self.keys = []
+        self.grid = None
+        self.enemy_system = None
+        self.layer = None
+        self.text = None
+        self.player_spawn = 100, 100
+        self.next = False
+        self.this_blurb = ''
+        self.blurb = ''
+
+    def __repr__(self):
+        return f'PreparedLevel({self.name})'
+
+
+class LevelLoader:
+    """Prepares a level on a worker thread, so it's ready to swap in without stalling the game."""
+    def __init__(self, level):
+        self.level = level
+        self.name = None
+        self.future = None  # Result of the latest start, every start gets its own so older workers can't overwrite it
+
+    def __repr__(self):
+        return f'LevelLoader({self.name}, ready={self.ready})'
+
+    @property
+    def ready(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def start(self, name: str, font):
+        """Start preparing a level in the background."""
+        self.name = name
+        self.future = Future()
+        threading.Thread(target=self.work, args=(self.future, name, font), daemon=True).start()
+
+    def work(self, future: Future, name: str, font):
+        try:
+            future.set_result(self.level.prepare(name, font))
+        except Exception as error:  # Raised again on the main thread by finish
+            future.set_exception(error)
+
+    def finish(self, name: str, font) -> PreparedLevel:
+        """Returns the prepared level, waiting for the worker if it isn't done yet.
+        Prepares it right away if a different level (or nothing) was started."""
+        if self.future is None or self.name != name:
+            return self.level.prepare(name, font)
+        future, self.future = self.future, None
+        return future.result()
+
+
 class Level(Base):
     """A level contains all tiles, walls, enemies, etc. needed for a level.
     Loads information from a json file for levels.
     Also contains real tile level information (coins, player spawn, etc.)"""
-    def __init__(self, level_file: str, font, offset: tuple=(0, 0), first: bool=False):
+    def __init__(self, level_file: str, font, offset: tuple=(0, 0), first: bool=False, headless: bool=False):
         super().__init__()
+        self.headless = headless  # Headless levels never add anything to drawn
         self.ox, self.oy = offset
         self.size_y = 0
         self.size_x = 0
@@ -366,6 +656,9 @@ class Level(Base):
         self.coins = []
         self.important_tiles = []  # Any tile with player interacting features goes here
         self.keys = []
+        self.grid = SpatialHash(50)  # Everything the player can touch which doesn't move, bucketed by tile
+        self.enemy_system = EnemySystem([])
+        self.layer = None  # Pre-drawn tiles and static walls
         self.text = None
         self.text_index = 0
         self.coins_needed = 0
@@ -380,6 +673,10 @@ class Level(Base):
         self.final = False
         self.hidden = False
 
+    def add_to_drawn(self, section: str, thing: Base, index: int=None):
+        if not self.headless:
+            add_to_drawn(section, thing, index)
+
     def get_tile(self, x: int, y: int) -> [Tile, None]:
         try:
             if x > self.size_x or x < 0:
@@ -400,10 +697,12 @@ class Level(Base):
             wall.hide = True
         for enemy in self.enemies:
             enemy.hide = True
+        self.enemy_system.paused = True
         for coin in self.coins:
             coin.hide = True
         for key in self.keys:
             key.hide = True
+        self.layer.hide = True
         self.text.hide = True
 
     def unhide(self):
@@ -416,101 +715,119 @@ class Level(Base):
             wall.hide = False
         for enemy in self.enemies:
             enemy.hide = False
+        self.enemy_system.paused = False
         for coin in self.coins:
             coin.hide = False
         for key in self.keys:
             key.hide = False
+        self.layer.hide = False
         self.text.hide = False
 
+    def apply(self, prepared):
+        """Swap in a level made by prepare. The current level should be reset first."""
+        self.ox, self.oy = prepared.ox, prepared.oy
+        self.size_x, self.size_y = prepared.size_x, prepared.size_y
+        self.tiles = prepared.tiles
+        self.important_tiles = prepared.important_tiles
+        self.walls = prepared.walls
+        self.coins = prepared.coins
+        self.enemies = prepared.enemies
+        self.keys = prepared.keys
+        self.grid = prepared.grid
+        self.enemy_system = prepared.enemy_system
+        self.layer = prepared.layer
+        self.text = prepared.text
+        self.coins_needed = len(self.coins)
+        self.player_spawn = prepared.player_spawn
+        self.next = prepared.next
+        self.this_blurb = prepared.this_blurb
+        self.blurb = prepared.blurb
+        if self.next is False:
+            self.final = True
+
+        for wall in self.walls:
+            self.add_to_drawn('collides', wall)
+        self.add_to_drawn('bg', self.layer, 0)
+        for thing in self.coins + self.enemies + self.keys:
+            self.add_to_drawn('collides', thing)
+        self.add_to_drawn('ui', self.text)
+        self.hidden = False
+
     def load(self, file: str, font, first: bool=False):
-        """Converts json info in to level objects. Do not call more than once!"""
-        with open(f'data/tiletemplates.json') as tile_template_data:  # Load tile templates and level data
-            tile_templates = json.loads(tile_template_data.read())
-        with open(f'data/{file}.json') as level_data:
-            level_info = json.loads(level_data.read())
-            self.player_spawn = level_info.get('spawnx', 50), level_info.get('spawny', 50)
-            self.size_y = len(level_info['tiles'])
-            self.size_x = len(level_info['tiles'][0])
-            if level_info.get('centered', False):
-                self.ox = size[0] / 2 - (self.size_x * 50) / 2
-                self.oy = size[1] / 2 - (self.size_y * 50) / 2
-            for y, row_y in enumerate(level_info["tiles"]):
-                tiles_y = []
-                for x, tile_data in enumerate(row_y):
-                    template = tile_data.get('template', False)
-                    if template:
-                        template_data = tile_templates[template]  # Get tile data from tile itself or template
-                    else:
-                        template_data = tile_data
-                    r, g, b = tile_data.get('color', template_data.get('color', BLUE_BASIC))
-                    new_tile = Tile(x, y, (r, g, b), self)  # Create tile with data
-                    new_tile.x += self.ox
-                    new_tile.y += self.oy
-                    new_tile.nil = template_data.get('nil', False)
-                    new_tile.checkpoint = template_data.get('checkpoint', False)  # Set various flags
-                    new_tile.end = template_data.get('end_level', False)
-                    new_tile.reset_point = tile_data.get('newx', template_data.get('newx', 0)), tile_data.get('newy', template_data.get('newy', 0))
-                    new_tile.warp = tile_data.get('warp', template_data.get('warp', False)), tile_data.get('warpx', template_data.get('warpx', 0)) + self.ox, tile_data.get('warpy', template_data.get('warpy', 0)) + self.oy
-                    if new_tile.end or new_tile.checkpoint or new_tile.warp[0]:
-                        self.important_tiles.append(new_tile)
-                        add_to_drawn('collides', new_tile, 0)
-                    else:
-                        add_to_drawn('bg', new_tile)
-                    tiles_y.append(new_tile)
-                self.tiles.append(tiles_y)
-
-            for wall in level_info['walls']:
-                start = wall['sx'] + self.ox, wall['sy'] + self.oy  # start x and y to end x and y
-                end = wall['ex'] + self.ox, wall['ey'] + self.oy
-                color = wall.get('color', BLACK)
-                wall = Wall(start, end, color, 6, wall.get('axis', 'xy'), associate=wall.get('id', None))
-                add_to_drawn('collides', wall)
-                self.walls.append(wall)
-                if wall.id is not None:
-                    wall.crect.surf.set_alpha(200)
-
-            for coin in level_info.get('coins', []):
-                new_coin = Coin((round(coin['x'] + self.ox), round(coin['y'] + self.oy)))
-                add_to_drawn('collides', new_coin)
-                self.coins.append(new_coin)
-                self.coins_needed += 1
-
-            for enemy in level_info.get('enemies', []):
-                path = []
-                for point in enemy.get('path', []):
-                    x, y = point
-                    x += self.ox
-                    y += self.oy
-                    path.append((x, y))
-                new_enemy = Enemy((round(enemy['x'] + self.ox), round(enemy['y'] + self.oy)), enemy.get('speed', 0), path, enemy.get('color', BLUE_ENEMY))
-                pivot = enemy.get('pivot', None)
-                if pivot:
-                    new_enemy.pivot = pivot[0] + self.ox, pivot[1] + self.oy
-                    new_enemy.pivot_angle += enemy.get('angle', 0)
-                add_to_drawn('collides', new_enemy)
-                self.enemies.append(new_enemy)
-
-            for key in level_info.get('keys', []):
-                new_key = Key((key['x'] + self.ox, key['y'] + self.oy), key['id'], key.get('color', (255, 255, 255)))
-                add_to_drawn('collides', new_key)
-                self.keys.append(new_key)
-
-            self.text = Text((size[0] / 2, 100), (20, 20, 20), level_info.get('tutorial_text'), font, centered=True)
-            add_to_drawn('ui', self.text)
-            self.player_spawn = level_info.get('spawnx', 100), level_info.get('spawny', 100)
-            self.next = level_info.get('next_level', False)
-            self.this_blurb = level_info.get('blurb', 'Sample Text')
-            if first:
-                self.blurb = level_info.get('blurb', 'Sample Text')
-            elif self.next:
-                with open(f'data/{self.next}.json') as level_data2:
-                    level_info2 = json.loads(level_data2.read())
-                    self.blurb = level_info2.get('blurb', 'Sample Text')
-            else:  # Otherwise final level
-                self.blurb = 'FINAL'
-            if self.next is False:
-                self.final = True
-            self.hidden = False
+        """Converts json info in to level objects. Do not call more than once without resetting!"""
+        self.apply(self.prepare(file, font, first))
+
+    def prepare(self, file: str, font, first: bool=False):
+        """Builds every level object from a level file without adding anything to this level or drawn,
+        so it can be done on another thread while the current level is still being used. See apply."""
+        prepared = PreparedLevel(file)
+        prepared.ox, prepared.oy = ox, oy = self.ox, self.oy
+        source = levels.source(file)  # Compiled level if there's an up to date one, otherwise the level file
+        prepared.size_y = size_y = source.size_y
+        prepared.size_x = size_x = source.size_x
+        if source.centered:
+            prepared.ox = ox = size[0] / 2 - (size_x * 50) / 2
+            prepared.oy = oy = size[1] / 2 - (size_y * 50) / 2
+        grid = prepared.grid = SpatialHash(50, (ox, oy))
+        for y, row_y in enumerate(source.tile_rows()):
+            tiles_y = []
+            for x, (color, nil, checkpoint, end, newx, newy, warp, warpx, warpy) in enumerate(row_y):
+                new_tile = tile_pool.acquire(x, y, color, self)  # Create tile with data
+                new_tile.x += ox
+                new_tile.y += oy
+                new_tile.nil = nil
+                new_tile.checkpoint = checkpoint  # Set various flags
+                new_tile.end = end
+                new_tile.reset_point = newx, newy
+                new_tile.warp = warp, warpx + ox, warpy + oy
+                if end or checkpoint or warp:
+                    prepared.important_tiles.append(new_tile)
+                    grid.insert(new_tile)
+                tiles_y.append(new_tile)
+            prepared.tiles.append(tiles_y)
+
+        for sx, sy, ex, ey, color, axis, wall_id in source.walls():
+            wall = wall_pool.acquire((sx + ox, sy + oy), (ex + ox, ey + oy), color, 6, axis, associate=wall_id)
+            grid.insert(wall)
+            prepared.walls.append(wall)
+            if wall.id is not None:
+                wall.crect.surf.set_alpha(200)
+            else:  # Walls without keys never change, so get drawn with the tiles
+                wall.baked = True
+        prepared.layer = TileLayer(prepared.tiles, prepared.walls)
+        if not self.headless:
+            prepared.layer.bake()
+
+        for x, y in source.coins():
+            new_coin = coin_pool.acquire((round(x + ox), round(y + oy)))
+            grid.insert(new_coin)
+            prepared.coins.append(new_coin)
+
+        for x, y, speed, path, color, pivot, angle in source.enemies():
+            path = [(point_x + ox, point_y + oy) for point_x, point_y in path]
+            new_enemy = enemy_pool.acquire((round(x + ox), round(y + oy)), speed, path, color)
+            if pivot:
+                new_enemy.pivot = pivot[0] + ox, pivot[1] + oy
+                new_enemy.pivot_angle += angle
+            prepared.enemies.append(new_enemy)
+        prepared.enemy_system = EnemySystem(prepared.enemies)
+
+        for x, y, key_id, color in source.keys():
+            new_key = Key((x + ox, y + oy), key_id, color)
+            grid.insert(new_key)
+            prepared.keys.append(new_key)
+
+        prepared.text = Text((size[0] / 2, 100), (20, 20, 20), source.tutorial_text, font, centered=True)
+        prepared.player_spawn = source.spawn
+        prepared.next = source.next_level
+        prepared.this_blurb = source.blurb
+        if first:
+            prepared.blurb = source.blurb
+        elif prepared.next:
+            prepared.blurb = levels.blurb(prepared.next)
+        else:  # Otherwise final level
+            prepared.blurb = 'FINAL'
+        return prepared
 
     def neighbour(self, x: int, y: int) -> list:
         neighbours = [self.get_tile(x - 1, y - 1),
@@ -523,6 +840,18 @@ class Level(Base):
                       self.get_tile(x + 1, y + 1)]
         return neighbours
 
+    def respawn(self, player):
+        """Sends the player back to the spawn point. Any coins not kept by a checkpoint are lost."""
+        self.spawn(player)
+        for coin in self.coins:
+            if coin.collected and not coin.perm_collected:
+                coin.collected = False
+                self.coins_collected -= 1
+
+    def spawn(self, player):
+        """Puts the player at the spawn point."""
+        player.teleport(self.player_spawn[0] + self.ox, self.player_spawn[1] + self.oy)
+
     def reset(self):
         """Removes and resets all walls, tiles, important values, etc. from existence."""
         for row_y in self.tiles:
@@ -534,17 +863,52 @@ class Level(Base):
             enemy.die = True
         for coin in self.coins:
             coin.die = True
+        for key in self.keys:
+            key.die = True
+        if not self.headless:  # Pooled things come back alive, so they can't be left in drawn
+            drawn.compact('bg', 'collides')
+        tile_pool.release(tile for row_y in self.tiles for tile in row_y)
+        wall_pool.release(self.walls)
+        enemy_pool.release(self.enemies)
+        coin_pool.release(self.coins)
 
         self.tiles = []
         self.walls = []
         self.enemies = []
         self.coins = []
+        self.keys = []
         self.important_tiles = []
+        self.grid.clear()
+        self.enemy_system = EnemySystem([])
+        self.layer.die = True
         self.text.die = True
 
         self.coins_collected = 0
         self.coins_needed = 0
 
+    def collect_coin(self, coin: Coin):
+        coin.collected = True
+        self.coins_collected += 1
+
+    def collect_key(self, key: Key):
+        key.die = True
+        self.grid.remove(key)
+        self.unlock(key)
+
+    def nearby(self, bounds: tuple) -> list:
+        """Returns everything which could be touching this x, y, width, height box."""
+        return self.grid.query(bounds) + self.enemy_system.touching(bounds)
+
+    def tick(self):
+        self.enemy_system.tick()
+
+    def interpolate(self, alpha: float):
+        """Draw moving things in between ticks, see EnemySystem.interpolate."""
+        self.enemy_system.interpolate(alpha)
+
+    def settle(self):
+        self.enemy_system.settle()
+
     def unlock(self, key: Key):
         """Disabled collisions on walls with the same ID as this key"""
         for wall in self.walls:
@@ -0,0 +1,87 @@
+"""Writes level json in the layout the hand made levels use, without going through json.dumps(indent=...) and a beautifier.
+Tiles are written one row a line and walls, enemies, coins and keys one a line, so large levels stay readable
+and diff well. Files are written to a temporary file first and moved over the old one, so a level is never half written,
+and LevelSaver does the writing on a thread so saving doesn't hold up the editor."""
+import json
+import os
+import threading
+
+
+def dump(value) -> str:
+    return json.dumps(value, separators=(', ', ': '))
+
+
+def level_lines(data: dict):
+    """The lines of a level file, one at a time. Lists of rows or things get an item a line
+    and a blank line before them, everything else goes on the line of its key."""
+    yield '{\n'
+    last = len(data) - 1
+    for i, (key, value) in enumerate(data.items()):
+        comma = ',' if i < last else ''
+        if isinstance(value, list) and value and isinstance(value[0], (list, dict)):
+            if i > 0:
+                yield '\n'
+            yield f'  {dump(key)}: [\n'
+            end = len(value) - 1
+            for j, item in enumerate(value):
+                yield f'    {dump(item)}{"," if j < end else ""}\n'
+            yield f'  ]{comma}\n'
+        else:
+            yield f'  {dump(key)}: {dump(value)}{comma}\n'
+    yield '}\n'
+
+
+def write_level(path: str, data: dict) -> str:
+    """Write a level to path, replacing it only once all of it is written. Returns the path."""
+    with open(f'{path}.tmp', 'w') as level_file:
+        level_file.writelines(level_lines(data))
+    os.replace(f'{path}.tmp', path)
+    return path
+
+
+class LevelSaver:
+    """Writes levels on a background thread. Saving while a save is still going queues the newer level,
+    replacing anything queued before it, so only the latest version gets written once the current one is done.
+    The level data mustn't be changed after it's handed over."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = None  # (path, data) waiting to be written
+        self.thread = None
+        self.saved = None  # Path of the last level written
+        self.error = None  # Raised again by wait
+
+    def __repr__(self):
+        return f'LevelSaver(saving={self.busy}, saved={self.saved})'
+
+    @property
+    def busy(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def save(self, path: str, data: dict):
+        with self.lock:
+            self.pending = path, data
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.work, daemon=True)
+                self.thread.start()
+
+    def work(self):
+        while True:
+            with self.lock:
+                if self.pending is None:
+                    self.thread = None
+                    return
+                path, data = self.pending
+                self.pending = None
+            try:
+                self.saved = write_level(path, data)
+            except Exception as error:  # Raised again on the main thread by wait
+                self.error = error
+
+    def wait(self):
+        """Wait for everything queued to be written, raising the error if writing failed."""
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
@@ -21,6 +21,8 @@ class Player(Base):
         self.speed = 2
         self.hide = False
         self.can_move = True
+        self.last = self.x, self.y  # Where the player was drawn before the current tick, see interpolate
+        self.settled = None  # Where the player really is while drawn in between ticks
 
     @property
     def velocity_direction(self) -> tuple:
@@ -59,6 +61,10 @@ class Player(Base):
             self.bg_rect.surf.set_alpha(round(self.alpha))
             self.center_rect.surf.set_alpha(round(self.alpha))
 
+    @property
+    def bounds(self) -> tuple:
+        return self.bg_rect.bounds
+
     @property
     def origin(self) -> tuple:
         return self.x + self.bg_rect.width / 2, self.y + self.bg_rect.height / 2
@@ -84,6 +90,32 @@ class Player(Base):
                 elif x > nx:  # Push right
                     self.x += nx - x + self.bg_rect.width / 2
 
+    def key_down(self, key: int):
+        """Speed up in the direction of a pressed movement key."""
+        if self.can_move:
+            if key == pygame.K_w:
+                self.vy -= self.speed
+            elif key == pygame.K_s:
+                self.vy += self.speed
+            elif key == pygame.K_d:
+                self.vx += self.speed
+            elif key == pygame.K_a:
+                self.vx -= self.speed
+            elif key == pygame.K_F2:
+                self.set_speed(4)
+
+    def key_up(self, key: int):
+        """Undo the speed a released movement key added."""
+        if self.can_move:
+            if key == pygame.K_w:
+                self.vy += self.speed
+            elif key == pygame.K_s:
+                self.vy -= self.speed
+            elif key == pygame.K_d:
+                self.vx -= self.speed
+            elif key == pygame.K_a:
+                self.vx += self.speed
+
     def reset(self):
         """Resets changes back to their default."""
         self.set_speed(2)
@@ -95,6 +127,25 @@ class Player(Base):
         self.vy = dir[1] * speed
         self.speed = speed
 
+    def remember(self):
+        """Keep where the player is before a tick gets run, to draw it in between ticks."""
+        self.last = self.bg_rect.x, self.bg_rect.y
+
+    def interpolate(self, alpha: float, jump: float=50):
+        """Draw the player alpha (0 to 1) of the way from where it was before the last tick to where it is now.
+        Moves further than jump (respawns, warps) aren't smoothed. Has to be undone with settle before the next tick."""
+        x, y = self.bg_rect.x, self.bg_rect.y
+        self.settled = x, y
+        last_x, last_y = self.last
+        if abs(x - last_x) <= jump and abs(y - last_y) <= jump:
+            self.bg_rect.x, self.bg_rect.y = last_x + (x - last_x) * alpha, last_y + (y - last_y) * alpha
+
+    def settle(self):
+        """Undo interpolate."""
+        if self.settled is not None:
+            self.bg_rect.x, self.bg_rect.y = self.settled
+            self.settled = None
+
     def teleport(self, x: int, y: int):
         """Sets the players origin to this x and y value."""
         self.x = x - self.bbox_size[0] / 2
@@ -0,0 +1,151 @@
+"""Frame timings, shown in game and in the editor with F3 and saved with F4."""
+import csv
+import json
+import math
+import os
+import time
+from collections import deque, Counter
+import pygame
+from base import Base
+
+PROFILE_FOLDER = 'profiles'
+
+
+class Profiler(Base):
+    """Times the phases of each frame, keeping the last window frames.
+    The main loop calls begin when a frame starts, mark after each phase (which adds the time since the last mark
+    to that phase) and end once the frame is on screen. Time spent waiting for the next frame isn't counted.
+    Parts of a phase which are spread out, like collision checks in between ticking things, can be timed with
+    start_part and stop_part instead, which takes their time out of the phase that gets marked next.
+    While not hidden it draws an overlay with frame time percentiles, the slowest phases and how many of each kind
+    of thing there is, refreshed every refresh frames so it can be read."""
+    def __init__(self, font, window: int=600, refresh: int=15, position: tuple=(10, 10)):
+        super().__init__()
+        self.font = font
+        self.frames = deque(maxlen=window)  # (frame time, {phase: seconds}) of the last window frames
+        self.phases = {}  # Of the frame being timed
+        self.start = self.last = time.perf_counter()
+        self.started = 0  # When start_part was last called
+        self.taken = 0  # Seconds timed by start_part and stop_part since the last mark
+        self.counts = {}  # Kind of thing: amount of them, as of the last count
+        self.frame = 0
+        self.refresh = refresh
+        self.x, self.y = position
+        self.hide = True
+        self.text = ''  # What the overlay shows
+        self.surf = None
+        self.saved = None  # Path of the last export, shown on the overlay
+
+    def __repr__(self):
+        return f'Profiler({len(self.frames)} frames, p50 {self.percentile(50):.2f} ms, p99 {self.percentile(99):.2f} ms)'
+
+    def begin(self):
+        self.phases = {}
+        self.taken = 0
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, phase: str):
+        """Count the time since the last mark (or begin) towards a phase, apart from what start_part and stop_part timed."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last - self.taken
+        self.last = now
+        self.taken = 0
+
+    def start_part(self):
+        """Start timing part of a phase, see stop_part."""
+        self.started = time.perf_counter()
+
+    def stop_part(self, phase: str):
+        """Count the time since start_part towards a phase instead of the phase marked next."""
+        seconds = time.perf_counter() - self.started
+        self.phases[phase] = self.phases.get(phase, 0) + seconds
+        self.taken += seconds
+
+    def end(self, scene):
+        """Finish timing the frame. Things in the scene only get counted while the overlay shows."""
+        self.frames.append((time.perf_counter() - self.start, self.phases))
+        self.frame += 1
+        if self.hide is False and self.frame % self.refresh == 0:
+            self.count(scene)
+            self.update_overlay()
+
+    def count(self, scene):
+        """Count the living things in a scene by kind."""
+        counts = Counter()
+        for section, things in scene.items():
+            for thing in things:
+                if thing.die is False:
+                    counts[type(thing).__name__] += 1
+        self.counts = dict(counts.most_common())
+
+    def percentile(self, percent: float) -> float:
+        """Frame time in milliseconds which percent of the kept frames were at or under."""
+        if not self.frames:
+            return 0
+        times = sorted(frame_time for frame_time, phases in self.frames)
+        index = max(math.ceil(percent / 100 * len(times)) - 1, 0)
+        return times[index] * 1000
+
+    def averages(self) -> dict:
+        """Phase: average milliseconds a frame, slowest first."""
+        totals = Counter()
+        for frame_time, phases in self.frames:
+            totals.update(phases)
+        amount = len(self.frames) or 1
+        return {phase: total * 1000 / amount for phase, total in totals.most_common()}
+
+    def summary(self) -> dict:
+        return {'frames': len(self.frames),
+                'p50': self.percentile(50),
+                'p99': self.percentile(99),
+                'max': max((frame_time for frame_time, phases in self.frames), default=0) * 1000,
+                'phases': self.averages(),
+                'counts': self.counts}
+
+    def update_overlay(self):
+        lines = [f'frame p50 {self.percentile(50):.2f} ms  p99 {self.percentile(99):.2f} ms']
+        if self.saved is not None:
+            lines.append(f'saved {self.saved}')
+        lines += [f'{phase} {ms:.2f} ms' for phase, ms in self.averages().items()]
+        lines += [f'{kind} x{amount}' for kind, amount in self.counts.items()]
+        self.text = '\n'.join(lines)
+        if self.font is None:
+            return
+        renders = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        height = self.font.get_linesize()
+        self.surf = pygame.Surface((max(r.get_width() for r in renders) + 10, height * len(renders) + 10), pygame.SRCALPHA)
+        self.surf.fill((0, 0, 0, 160))
+        for i, render in enumerate(renders):
+            self.surf.blit(render, (5, 5 + i * height))
+
+    def draw(self, screen, offsets):
+        if self.hide is False and self.surf is not None:
+            screen.blit(self.surf, (self.x + offsets[0], self.y + offsets[1]))
+
+    @property
+    def bounds(self) -> tuple:
+        """The box the overlay gets drawn in, None while it isn't drawn."""
+        if self.hide is True or self.surf is None:
+            return None
+        return self.x, self.y, self.surf.get_width(), self.surf.get_height()
+
+    def export(self, name: str, scene=None, **info) -> tuple:
+        """Save the kept frames to profiles/name-time.csv, one row a frame in milliseconds,
+        and the summary plus info to a .json next to it. The overlay gets shown with where they went. Returns both paths."""
+        if scene is not None:
+            self.count(scene)
+        os.makedirs(PROFILE_FOLDER, exist_ok=True)
+        path = os.path.join(PROFILE_FOLDER, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}')
+        phases = list(self.averages())
+        with open(f'{path}.csv', 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['frame', 'total'] + phases)
+            first = self.frame - len(self.frames)
+            for i, (frame_time, frame_phases) in enumerate(self.frames):
+                writer.writerow([first + i, round(frame_time * 1000, 4)] + [round(frame_phases.get(phase, 0) * 1000, 4) for phase in phases])
+        with open(f'{path}.json', 'w') as file:
+            json.dump({**info, **self.summary()}, file, indent=4)
+        self.saved = path
+        self.hide = False
+        self.update_overlay()
+        return f'{path}.csv', f'{path}.json'
@@ -0,0 +1,135 @@
+"""Dirty rectangle rendering.
+Instead of clearing and redrawing the whole screen every frame, only the boxes around things which moved
+or changed get repainted and sent to the display. Turned on with dirty_rects in base.py."""
+import math
+import pygame
+
+LOOKS = ('hide', 'die', 'collected', 'collide', 'alpha', 'text', 'color', 'facing')  # Attributes which change how a thing looks
+
+
+class DirtyRenderer:
+    """Repaints the parts of the screen where watched things were last frame and are this frame.
+    Every thing with bounds in the watched sections is watched, as well as anything passed to track
+    (like texts inside of menus). A box gets repainted by filling it with the background and drawing
+    everything that overlaps it, clipped to the box. Things without bounds get drawn in every box.
+    Anything else changing (menus opening, levels loading) needs invalidate, which repaints everything next frame."""
+    def __init__(self, display, screen, background: tuple, sections: tuple=('collides', 'ui'), padding: int=2, max_rects: int=64):
+        self.display = display
+        self.screen = screen
+        self.background = background
+        self.sections = sections
+        self.padding = padding  # Extra pixels around each box, for rounding and anti aliasing
+        self.max_rects = max_rects  # Past this many boxes a full repaint is cheaper
+        self.tracked = []
+        self.previous = {}  # thing: (screen rect, look) as of the last frame
+        self.offsets = None  # Camera offsets of the last frame
+        self.full = True  # Repaint everything next frame
+        self.repainted = 0  # Boxes repainted by the last frame, -1 if everything was
+
+    def __repr__(self):
+        return f'DirtyRenderer({len(self.previous)} watched, {self.repainted} repainted)'
+
+    def track(self, *things):
+        """Watch things which aren't in drawn themselves, using screen coordinates."""
+        self.tracked.extend(things)
+
+    def invalidate(self):
+        self.full = True
+
+    def rect_of(self, thing, offsets: tuple):
+        """The screen box of a thing, or None if it doesn't have bounds."""
+        bounds = getattr(thing, 'bounds', None)
+        if bounds is None:
+            return None
+        x, y, w, h = bounds
+        x, y = x - offsets[0], y - offsets[1]
+        pad = self.padding
+        left, top = math.floor(x) - pad, math.floor(y) - pad
+        return pygame.Rect(left, top, math.ceil(x + w) + pad - left, math.ceil(y + h) + pad - top)
+
+    def watch(self, scene, camera) -> dict:
+        """Returns thing: (screen rect, look) of everything being watched this frame."""
+        watched = {}
+        for section, things in scene.items():
+            if section not in self.sections:
+                continue
+            offsets = (0, 0) if section == 'ui' else camera.offsets
+            for thing in things:
+                if thing.die is False:
+                    rect = self.rect_of(thing, offsets)
+                    if rect is not None:
+                        watched[thing] = rect, tuple(getattr(thing, name, None) for name in LOOKS)
+        for thing in self.tracked:
+            rect = self.rect_of(thing, (0, 0))
+            if rect is not None:
+                watched[thing] = rect, tuple(getattr(thing, name, None) for name in LOOKS)
+        return watched
+
+    def render(self, scene, camera):
+        """Draw the scene to the display. Returns the list of rects to pass to pygame.display.update,
+        or None if the whole display changed."""
+        watched = self.watch(scene, camera)
+        dirty = []
+        if not self.full and camera.offsets == self.offsets:
+            previous = self.previous
+            for thing, entry in watched.items():
+                before = previous.get(thing)
+                if before != entry:
+                    dirty.append(entry[0])
+                    if before is not None:
+                        dirty.append(before[0])
+            for thing, entry in previous.items():
+                if thing not in watched:  # Gone, so whatever it covered has to be painted over
+                    dirty.append(entry[0])
+        self.previous = watched
+        self.offsets = camera.offsets
+
+        screen_rect = self.screen.get_rect()
+        dirty = [rect.clip(screen_rect) for rect in dirty]
+        dirty = [rect for rect in dirty if rect.width > 0 and rect.height > 0]
+        if self.full or len(dirty) > self.max_rects:
+            self.full = False
+            self.repainted = -1
+            self.screen.fill(self.background)
+            self.draw(scene, camera, None)
+            self.display.blit(self.screen, (0, 0))
+            return None
+
+        dirty = self.merge(dirty)
+        for rect in dirty:
+            self.screen.set_clip(rect)
+            self.screen.fill(self.background, rect)
+            self.draw(scene, camera, rect)
+        self.screen.set_clip(None)
+        for rect in dirty:
+            self.display.blit(self.screen, rect, rect)
+        self.repainted = len(dirty)
+        return dirty
+
+    def draw(self, scene, camera, rect):
+        """Draw everything overlapping rect, or everything on screen if rect is None."""
+        for section, things in scene.items():
+            ui = section == 'ui'
+            offsets = (0, 0) if ui else camera.offsets
+            for thing in things:
+                if thing.die is True:
+                    continue
+                if rect is not None:
+                    box = self.rect_of(thing, offsets)
+                    if box is not None and not box.colliderect(rect):
+                        continue
+                elif not ui and not camera.visible(thing):
+                    continue
+                thing.draw(self.screen, offsets)
+
+    @staticmethod
+    def merge(rects: list) -> list:
+        """Combine overlapping boxes, so no part of the screen gets repainted twice."""
+        merged = []
+        for rect in rects:
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect = rect.union(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
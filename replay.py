@@ -0,0 +1,171 @@
+"""Recording and playback of level runs.
+A replay is the list of movement key presses made during a level, indexed by tick.
+Since levels are deterministic, simulating the same presses plays out the exact same run.
+
+Run this file to play back a replay: python replay.py replays/level1-1.rpl [--speed 4] [--no-render]"""
+import argparse
+import os
+import struct
+import pygame
+
+MAGIC = b'EGRP'
+VERSION = 1
+HEADER = struct.Struct('<4sBH')  # Magic, version, level name length
+INFO = struct.Struct('<fffIII')  # Starting vx, vy and speed, ticks, deaths, event count
+KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_F2)  # Only keys that change the player's velocity
+PRESSED = 0x80  # Set on the key code of KEYDOWN events
+
+
+class ReplayError(Exception):
+    pass
+
+
+def write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data: bytes, index: int) -> tuple:
+    """Returns the value and the index after it."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[index]
+        index += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, index
+        shift += 7
+
+
+class Replay:
+    """Tick indexed input log of a single level.
+    Events are stored as the ticks since the last event followed by a key code, usually 2 bytes each."""
+    def __init__(self, level_name: str, velocity: tuple=(0, 0), speed: int=2):
+        self.level_name = level_name
+        self.velocity = velocity  # Keys can already be held down when a level starts
+        self.speed = speed
+        self.events = []  # (tick, key, pressed)
+        self.ticks = 0  # How long the run took, filled in when it's finished
+        self.deaths = 0
+
+    def __repr__(self):
+        return f'Replay({self.level_name}, {len(self.events)} events, {self.ticks} ticks, {self.deaths} deaths)'
+
+    @property
+    def time(self) -> float:
+        """Length of the run in milliseconds."""
+        return self.ticks * 1000 / 60
+
+    def record(self, tick: int, key: int, pressed: bool):
+        """Add a KEYDOWN (pressed) or KEYUP event which happened before this tick. Ignores keys that don't move the player."""
+        if key in KEYS:
+            self.events.append((tick, key, pressed))
+
+    def finish(self, ticks: int, deaths: int):
+        self.ticks = ticks
+        self.deaths = deaths
+
+    def simulation(self):
+        """Returns a Simulation of this level set up to play these inputs back."""
+        from simulation import Simulation  # Imported here so recording doesn't need the simulation
+        sim = Simulation(self.level_name, velocity=self.velocity, speed=self.speed)
+        sim.feed(self.events)
+        return sim
+
+    def verify(self) -> bool:
+        """Re-simulates the run without drawing anything. True if it completes the level
+        in the same amount of ticks with the same amount of deaths as were recorded."""
+        with self.simulation() as sim:
+            sim.advance(self.ticks)
+            return sim.completed and sim.ticks == self.ticks and sim.deaths == self.deaths
+
+    def to_bytes(self) -> bytes:
+        name = self.level_name.encode()
+        buffer = bytearray(HEADER.pack(MAGIC, VERSION, len(name)))
+        buffer += name
+        buffer += INFO.pack(self.velocity[0], self.velocity[1], self.speed, self.ticks, self.deaths, len(self.events))
+        last = 0
+        for tick, key, pressed in self.events:
+            write_varint(buffer, tick - last)
+            buffer.append(KEYS.index(key) | (PRESSED if pressed else 0))
+            last = tick
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        magic, version, name_length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError('Not a replay, or a replay from an incompatible version')
+        index = HEADER.size
+        name = data[index:index + name_length].decode()
+        index += name_length
+        vx, vy, speed, ticks, deaths, count = INFO.unpack_from(data, index)
+        index += INFO.size
+        replay = cls(name, (vx, vy), speed)
+        replay.finish(ticks, deaths)
+        tick = 0
+        for _ in range(count):
+            delta, index = read_varint(data, index)
+            tick += delta
+            code = data[index]
+            index += 1
+            replay.events.append((tick, KEYS[code & ~PRESSED], bool(code & PRESSED)))
+        return replay
+
+    def save(self, path: str=None) -> str:
+        """Saves to replays/<level name>.rpl unless told otherwise. Returns the path saved to."""
+        if path is None:
+            path = f'replays/{self.level_name}.rpl'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as replay_file:
+            replay_file.write(self.to_bytes())
+        return path
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'rb') as replay_file:
+            return cls.from_bytes(replay_file.read())
+
+
+def watch(replay: Replay, speed: float=1):
+    """Open a window and play a replay back at speed times normal speed."""
+    from base import size, caption
+    pygame.init()
+    display = pygame.display.set_mode(size)
+    pygame.display.set_caption(f'{caption} REPLAY {replay.level_name}')
+    clock = pygame.time.Clock()
+    sim = replay.simulation()
+    owed = 0  # Fractions of a tick carried over between frames, for speeds below 1
+    while not sim.completed and sim.ticks < replay.ticks:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                return sim
+        owed += speed
+        sim.advance(int(owed))
+        owed -= int(owed)
+        display.fill((180, 180, 180))
+        sim.draw(display, (0, 0))
+        pygame.display.update()
+        clock.tick(60)
+    pygame.quit()
+    return sim
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play back a recorded level run.')
+    parser.add_argument('replay', help='Path to a .rpl file')
+    parser.add_argument('--speed', type=float, default=1, help='Playback speed multiplier')
+    parser.add_argument('--no-render', action='store_true', help='Only re-simulate the run and check it')
+    args = parser.parse_args()
+
+    loaded = Replay.load(args.replay)
+    print(loaded)
+    if args.no_render:
+        print('Valid' if loaded.verify() else 'Does not match the recorded run')
+    else:
+        result = watch(loaded, args.speed)
+        print(result)
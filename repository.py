@@ -0,0 +1,109 @@
+"""Cached access to the json files in data/.
+Parsed files are kept in a size bound LRU and thrown out whenever the file on disk changes,
+so levels aren't re-parsed every time they're loaded, but edits (like editor exports) still show up."""
+from collections import OrderedDict
+from compiled import JsonLevel, CompiledLevel, CompileError
+import glob
+import json
+import os
+import threading
+
+
+class LevelRepository:
+    """Parses and caches level files, tile templates and level blurbs."""
+    def __init__(self, folder: str='data', max_levels: int=32):
+        self.folder = folder
+        self.max_levels = max_levels
+        self.cache = OrderedDict()  # name: (file stamp, parsed json)
+        self.blurbs = {}  # name: (file stamp, blurb). Kept even after a level leaves the cache
+        self.lock = threading.Lock()  # Levels get loaded from worker threads too
+
+    def __repr__(self):
+        return f'LevelRepository({self.folder}, {len(self.cache)} cached)'
+
+    def path(self, name: str) -> str:
+        return f'{self.folder}/{name}.json'
+
+    def compiled_path(self, name: str) -> str:
+        return f'{self.folder}/compiled/{name}.lvl'
+
+    def level_names(self) -> list:
+        """Every level in the folder, as opposed to templates and campaigns."""
+        names = sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(f'{self.folder}/*.json'))
+        return [name for name in names if 'tiles' in self.get(name)]
+
+    def campaigns(self) -> dict:
+        """Name: parsed json of every campaign file, sorted by name."""
+        names = sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(f'{self.folder}/campaign*.json'))
+        return {name: self.get(name) for name in names}
+
+    def campaign_levels(self) -> list:
+        """Every level in the campaign files, in campaign order without repeats."""
+        names = []
+        for campaign in self.campaigns().values():
+            for name in campaign['levels']:
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def stamp(self, name: str) -> tuple:
+        """Changes whenever the file gets changed."""
+        info = os.stat(self.path(name))
+        return info.st_mtime_ns, info.st_size
+
+    def get(self, name: str) -> dict:
+        """Returns the parsed json of data/<name>.json. Treat it as read only, it is shared."""
+        stamp = self.stamp(name)
+        with self.lock:
+            entry = self.cache.get(name)
+            if entry is not None and entry[0] == stamp:
+                self.cache.move_to_end(name)
+                return entry[1]
+        with open(self.path(name)) as data:
+            info = json.loads(data.read())
+        with self.lock:
+            self.cache[name] = stamp, info
+            self.cache.move_to_end(name)
+            if len(self.cache) > self.max_levels:
+                self.cache.popitem(last=False)
+            self.blurbs[name] = stamp, info.get('blurb', 'Sample Text')
+        return info
+
+    def templates(self) -> dict:
+        return self.get('tiletemplates')
+
+    def source(self, name: str):
+        """Returns a level to build objects from. The compiled level is used if there is one that's
+        newer than both the level file and the tile templates, otherwise the level file gets parsed."""
+        try:
+            compiled = os.stat(self.compiled_path(name)).st_mtime_ns
+        except OSError:
+            compiled = None
+        if compiled is not None:
+            newest = 0
+            for source in (name, 'tiletemplates'):
+                try:
+                    newest = max(newest, os.stat(self.path(source)).st_mtime_ns)
+                except OSError:  # Compiled levels can be shipped without their json
+                    pass
+            if compiled >= newest:
+                try:
+                    return CompiledLevel(self.compiled_path(name))
+                except (CompileError, ValueError, OSError):  # Fall back on the json
+                    pass
+        return JsonLevel(self.get(name), self.templates())
+
+    def blurb(self, name: str) -> str:
+        """Returns a level's blurb, only parsing the level if it changed since its blurb was last seen."""
+        entry = self.blurbs.get(name)
+        if entry is not None and entry[0] == self.stamp(name):
+            return entry[1]
+        return self.get(name).get('blurb', 'Sample Text')
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.blurbs.clear()
+
+
+levels = LevelRepository()
@@ -0,0 +1,53 @@
+"""Fixed timestep game clock."""
+import time
+import pygame
+
+
+def refresh_rate(default: int=60) -> int:
+    """The refresh rate of the main display, or default if it can't be found out."""
+    try:
+        rates = pygame.display.get_desktop_refresh_rates()
+    except (AttributeError, pygame.error):  # Older pygame, or no display
+        return default
+    return rates[0] if rates and rates[0] > 0 else default
+
+
+class Scheduler:
+    """Runs the simulation at exactly tick_rate ticks per second of real time, no matter how often frames get drawn.
+    Each frame asks advance how many ticks it owes: a late frame catches up by running several,
+    an early one runs none. What's left over is how far along the next tick the frame is (alpha),
+    for drawing things in between where they were and where they are. Between frames wait sleeps
+    until the next one is due, instead of spinning."""
+    def __init__(self, tick_rate: int=60, frame_rate: int=60, max_ticks: int=5):
+        self.tick_length = 1 / tick_rate  # Seconds
+        self.frame_length = 1 / frame_rate if frame_rate else 0  # 0 draws as fast as possible, for vsync
+        self.max_ticks = max_ticks  # Past this many owed ticks the rest is dropped, instead of falling further behind
+        self.owed = 0  # Seconds not yet simulated
+        self.alpha = 0
+        self.ticks = 0  # Ran in total
+        self.dropped = 0  # Ticks skipped by falling too far behind
+        self.frame_start = time.perf_counter()
+
+    def __repr__(self):
+        return f'Scheduler({round(1 / self.tick_length)} ticks/s, {self.ticks} ticks, {self.dropped} dropped)'
+
+    def advance(self) -> int:
+        """Start a new frame. Returns the amount of ticks to run before drawing it."""
+        now = time.perf_counter()
+        self.owed += now - self.frame_start
+        self.frame_start = now
+        ticks = int(self.owed / self.tick_length)
+        if ticks > self.max_ticks:
+            self.dropped += ticks - self.max_ticks
+            ticks = self.max_ticks
+            self.owed = ticks * self.tick_length
+        self.owed -= ticks * self.tick_length
+        self.alpha = min(self.owed / self.tick_length, 1)
+        self.ticks += ticks
+        return ticks
+
+    def wait(self):
+        """Sleep until the next frame should start."""
+        delay = self.frame_start + self.frame_length - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
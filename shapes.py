@@ -1,6 +1,36 @@
 from base import Base
+from collections import OrderedDict
 import pygame
 
+text_cache = OrderedDict()  # (font, text, color): rendered surface, shared between every Text
+text_cache_size = 512  # Least recently used renders get thrown out past this many
+surface_cache = {}  # (width, height, color): filled surface, shared between Rectangles made with shared=True
+
+
+def render_text(font, text: str, color: tuple):
+    """Render text with a font, reusing an earlier render of the same text if there is one."""
+    key = font, text, tuple(color)
+    surf = text_cache.get(key)
+    if surf is None:
+        surf = font.render(text, True, color)
+        text_cache[key] = surf
+        if len(text_cache) > text_cache_size:
+            text_cache.popitem(last=False)
+    else:
+        text_cache.move_to_end(key)
+    return surf
+
+
+def shared_surface(width, height, color: tuple):
+    """Returns a surface filled with a color. Rectangles of the same size and color all get the same one."""
+    key = width, height, tuple(color)
+    surf = surface_cache.get(key)
+    if surf is None:
+        surf = pygame.Surface((width, height))
+        surf.fill(color)
+        surf = surface_cache.setdefault(key, surf)  # Levels get built on worker threads too
+    return surf
+
 
 class Circle(Base):
     def __init__(self, coords: tuple, radius: int, color: tuple):
@@ -16,14 +46,25 @@ class Circle(Base):
     def set_color(self, color: tuple):
         self.color = color
 
+    @property
+    def bounds(self) -> tuple:
+        """The x, y, width and height of the box around this circle."""
+        return self.x - self.radius, self.y - self.radius, self.radius * 2, self.radius * 2
+
 
 class Rectangle(Base):
-    def __init__(self, dimensions: tuple, color: tuple):
+    """A filled box. Shared rectangles use the same surface as every other shared rectangle of their size and color,
+    so they can't have their surface changed (alpha, blits, etc.) but cost nothing besides the object itself."""
+    def __init__(self, dimensions: tuple, color: tuple, shared: bool=False):
         super().__init__()
         self.x, self.width, self.y, self.height = dimensions[0], dimensions[1], dimensions[2], dimensions[3]
         self.color = color
-        self.surf = pygame.Surface((self.width, self.height))
-        self.surf.fill(self.color)
+        self.shared = shared
+        if shared:
+            self.surf = shared_surface(self.width, self.height, self.color)
+        else:
+            self.surf = pygame.Surface((self.width, self.height))
+            self.surf.fill(self.color)
         self.collide = True
 
     def draw(self, screen, offsets: tuple):
@@ -33,7 +74,14 @@ class Rectangle(Base):
 
     def set_color(self, color: tuple):
         self.color = color
-        self.surf.fill(self.color)
+        if self.shared:  # Swap surfaces instead of filling one everything else is using
+            self.surf = shared_surface(self.width, self.height, self.color)
+        else:
+            self.surf.fill(self.color)
+
+    @property
+    def bounds(self) -> tuple:
+        return self.x, self.y, self.width, self.height
 
     def within(self, other):
         within_x = self.x + self.width >= other.x and other.x + other.width >= self.x
@@ -63,6 +111,13 @@ class Line(Base):
         self.start = p1
         self.dest = p2
 
+    @property
+    def bounds(self) -> tuple:
+        """The x, y, width and height of the box around this line, its width included."""
+        half_width = self.width / 2
+        x, y = min(self.start[0], self.dest[0]) - half_width, min(self.start[1], self.dest[1]) - half_width
+        return x, y, abs(self.dest[0] - self.start[0]) + self.width, abs(self.dest[1] - self.start[1]) + self.width
+
 
 class Text(Base):
     """Text. Used with UIElement."""
@@ -75,19 +130,39 @@ class Text(Base):
         self.font = font
         self.update = update
         self.hide = False
+        self.surf = None  # Last render of this text
+        self.rendered = None  # The text, color and font self.surf was rendered with
 
     def __repr__(self):
         return f'{self.text}'
 
     def draw(self, screen, offsets):
         if self.hide is False:
-            text = self.font.render(self.text, True, self.color)
+            if self.rendered != (self.text, self.color, self.font):  # Color or font got changed
+                self.render()
             x, y = self.x + offsets[0], self.y + offsets[1]
             if self.centered:
-                center = text.get_rect(center=(x, y))
-                screen.blit(text, center)
+                center = self.surf.get_rect(center=(x, y))
+                screen.blit(self.surf, center)
             else:
-                screen.blit(text, (x, y))
+                screen.blit(self.surf, (x, y))
+
+    def render(self):
+        self.surf = render_text(self.font, self.text, self.color)
+        self.rendered = self.text, self.color, self.font
+
+    @property
+    def bounds(self) -> tuple:
+        """The box this text gets drawn in, without offsets. None if there's no font to render it with."""
+        if self.font is None:
+            return None
+        if self.rendered != (self.text, self.color, self.font):
+            self.render()
+        if self.centered:
+            return tuple(self.surf.get_rect(center=(self.x, self.y)))
+        return self.x, self.y, self.surf.get_width(), self.surf.get_height()
 
     def set_text(self, text: str):
-        self.text = text
+        if text != self.text or self.surf is None:
+            self.text = text
+            self.render()
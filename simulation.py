@@ -0,0 +1,120 @@
+"""Headless simulation of levels.
+Runs the same rules as game.py one fixed tick at a time, without a display, audio or clock,
+so levels can be played through by scripts as fast as the CPU allows."""
+from collision import CollisionRegistry
+from level import Level, Wall, Tile, Enemy, Coin, Key
+from player import Player
+
+
+class Simulation:
+    """Plays through a single level using scripted key presses."""
+    def __init__(self, level_name: str, offset: tuple=(200, 200), velocity: tuple=(0, 0), speed: int=2):
+        self.level_name = level_name
+        self.level = Level(level_name, None, offset, first=True, headless=True)
+        self.player = Player((0, 0))
+        self.player.vx, self.player.vy = velocity  # Keys can already be held down when a level starts
+        self.player.speed = speed
+        self.level.spawn(self.player)
+        self.player.bg_rect.x, self.player.bg_rect.y = self.player.x, self.player.y
+        self.ticks = 0
+        self.deaths = 0
+        self.inputs = iter(())
+        self.pending = None  # Next input to be applied
+
+        self.collisions = CollisionRegistry()
+        self.collisions.register(Player, Wall, lambda player, wall: player.rect_intersect(wall.crect))
+        self.collisions.register(Player, Tile, Player.tile_interact)
+        self.collisions.register(Player, Enemy, self.player_hit_enemy)
+        self.collisions.register(Player, Coin, self.player_hit_coin)
+        self.collisions.register(Player, Key, self.player_hit_key)
+
+    def __repr__(self):
+        return f'Simulation({self.level_name}, {self.ticks} ticks, {self.deaths} deaths)'
+
+    @property
+    def completed(self) -> bool:
+        return self.level.end
+
+    @property
+    def time(self) -> float:
+        """Time spent in the level in milliseconds, the same as game.py keeps track of."""
+        return self.ticks * 1000 / 60
+
+    def player_hit_enemy(self, player: Player, enemy: Enemy):
+        if enemy.colliding(player.bg_rect):
+            self.deaths += 1
+            self.level.respawn(player)
+
+    def player_hit_coin(self, player: Player, coin: Coin):
+        if coin.colliding(player.bg_rect):
+            self.level.collect_coin(coin)
+
+    def player_hit_key(self, player: Player, key: Key):
+        if key.within(player.bg_rect):
+            self.level.collect_key(key)
+
+    def press(self, key: int):
+        """Same as a KEYDOWN event for this key in game.py."""
+        self.player.key_down(key)
+
+    def release(self, key: int):
+        """Same as a KEYUP event for this key in game.py."""
+        self.player.key_up(key)
+
+    def step(self, ticks: int=1):
+        """Simulate a number of ticks, stopping early if the level gets completed."""
+        level, player = self.level, self.player
+        for _ in range(ticks):
+            if level.end:
+                return
+            level.tick()
+            for thing in level.nearby(player.bounds):
+                self.collisions.dispatch(player, thing)
+            player.tick()
+            self.ticks += 1
+
+    def advance(self, ticks: int):
+        """Simulate a number of ticks, applying fed inputs as their ticks come up."""
+        end = self.ticks + ticks
+        while self.ticks < end and not self.level.end:
+            while self.pending is not None and self.pending[0] <= self.ticks:
+                tick, key, pressed = self.pending
+                if pressed:
+                    self.press(key)
+                else:
+                    self.release(key)
+                self.pending = next(self.inputs, None)
+            self.step()
+
+    def close(self):
+        """Give the level's pooled tiles, walls, enemies and coins back, once the simulation isn't needed anymore."""
+        self.level.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def draw(self, screen, offsets: tuple):
+        """Draw the level and player, since a headless level isn't in drawn."""
+        level = self.level
+        level.layer.draw(screen, offsets)
+        for thing in level.walls + level.coins + level.enemies:
+            thing.draw(screen, offsets)
+        for key in level.keys:
+            if not key.die:
+                key.draw(screen, offsets)
+        self.player.draw(screen, offsets)
+
+    def feed(self, inputs):
+        """Queue up inputs, an iterable of (tick, key, pressed) sorted by tick.
+        Each one is applied right before its tick gets simulated, the same way events are handled between ticks in game.py."""
+        self.inputs = iter(inputs)
+        self.pending = next(self.inputs, None)
+
+    def run(self, inputs, max_ticks: int) -> bool:
+        """Simulate until the level is completed or max_ticks have passed. Returns True if it was completed."""
+        self.feed(inputs)
+        self.advance(max_ticks - self.ticks)
+        return self.level.end
@@ -0,0 +1,571 @@
+"""Finds the fastest way through a level, or proves that there isn't one.
+
+The player's position is searched on a grid as fine as one tick of movement, one tick at a time,
+so enemies (which move the same way every time a level is played) can be worked out ahead of time.
+Everything reachable at a tick is kept as a boolean array per level state (coins, keys, spawn point and grid),
+and moving is shifting those arrays. The first tick an end tile can be reached on is the fastest
+possible time, and the moves that got there are turned in to a replay and checked with the Simulation.
+
+A level is unsolvable if no end tile can be reached even without enemies, or if every reachable
+position has already been reached at the same point of the enemies' cycle.
+
+    python solver.py level1-1 level1-2
+    python solver.py --campaign data/campaign1_easy.json --processes 4 --save"""
+import argparse
+import functools
+import json
+import math
+import multiprocessing
+import os
+import time
+import numpy as np
+import pygame
+from replay import Replay
+from repository import levels
+from simulation import Simulation
+
+MOVES = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]  # In cells, one cell is one tick of movement
+SOLVED = 'solved'
+UNSOLVABLE = 'unsolvable'
+UNKNOWN = 'unknown'  # Ran out of ticks or memory before finding out
+
+
+def enemy_positions(enemies, ticks: int) -> np.ndarray:
+    """Where every enemy of an EnemySystem is after each tick, index 0 being where they start, as a [tick, enemy, x/y] array.
+    Enemies move the same way every time a level is played. Ticks the system."""
+    positions = np.empty((ticks + 1, len(enemies), 2))
+    positions[0] = enemies.new
+    for tick in range(1, ticks + 1):
+        enemies.tick()
+        positions[tick] = enemies.new
+    return positions
+
+
+class Solution:
+    """What the solver found out about a level."""
+    def __init__(self, level_name: str, status: str, ticks: int=None, deaths: int=0, replay: Replay=None,
+                 verified: bool=False, explored: int=0, seconds: float=0):
+        self.level_name = level_name
+        self.status = status
+        self.ticks = ticks  # Fastest time, if solved
+        self.deaths = deaths
+        self.replay = replay  # Inputs of the fastest run, if solved
+        self.verified = verified  # The replay completes the level in the Simulation too
+        self.explored = explored  # Positions searched, summed over every tick
+        self.seconds = seconds  # Spent solving
+
+    def __repr__(self):
+        return f'Solution({self.level_name}, {self.status}, {self.ticks} ticks)'
+
+
+class Region:
+    """The cells where the player touches something, as a window of the grid and a mask inside of it."""
+    def __init__(self, kind: str, value, rows: slice, columns: slice, mask: np.ndarray):
+        self.kind = kind
+        self.value = value  # What touching it does, depends on kind
+        self.rows = rows
+        self.columns = columns
+        self.mask = mask
+
+    def __repr__(self):
+        return f'Region({self.kind}, {self.value})'
+
+    def covers(self, j: int, i: int) -> bool:
+        rows, columns = self.rows, self.columns
+        if rows.start <= j < rows.stop and columns.start <= i < columns.stop:
+            return bool(self.mask[j - rows.start, i - columns.start])
+        return False
+
+
+class Solver:
+    """Searches one level. States are (coins collected, coins kept by a checkpoint, keys collected, spawn point, grid),
+    the first three as bitmasks and the last two as indexes in to self.spawns and self.grids.
+    Positions are a step apart, so anything teleported a pixel off of them (by a warp or a respawn)
+    goes on one of the other grids, which are shifted by a pixel or so."""
+    def __init__(self, level_name: str, max_ticks: int=3600, max_period: int=1800, max_memory: int=512 * 2**20):
+        self.level_name = level_name
+        self.max_ticks = max_ticks
+        self.max_period = max_period  # Longest enemy cycle to remember positions over
+        self.max_memory = max_memory  # Bytes of searched positions to keep for working out the moves
+        sim = Simulation(level_name)
+        level, player = sim.level, sim.player
+        self.level = level
+        self.step = player.speed  # Distance between cells
+        self.width, self.height = player.bbox_size
+
+        left = [level.ox] + [wall.crect.x for wall in level.walls]
+        top = [level.oy] + [wall.crect.y for wall in level.walls]
+        right = [level.ox + level.size_x * 50] + [wall.crect.x + wall.crect.width for wall in level.walls]
+        bottom = [level.oy + level.size_y * 50] + [wall.crect.y + wall.crect.height for wall in level.walls]
+        self.gx = player.x - math.floor((player.x - min(left)) / self.step) * self.step  # The start is on the first grid
+        self.gy = player.y - math.floor((player.y - min(top)) / self.step) * self.step
+        self.nx = max(math.floor((max(right) - self.width - self.gx) / self.step) + 1, 1)
+        self.ny = max(math.floor((max(bottom) - self.height - self.gy) / self.step) + 1, 1)
+        self.grids = [(x, y) for y in range(self.step) for x in range(self.step)]  # Pixels each grid is shifted by
+        self.start = self.cell_of(player.x, player.y)
+
+        spawn_points = [level.player_spawn]
+        self.spawns = [self.spawn_cell(level.player_spawn)]  # (grid, cell) players respawn at
+        self.shapes = []  # (kind, value, x, y, width or radius, height or None) in the order the game checks them in
+        for row_y in level.tiles:
+            for tile in row_y:
+                box = tile.x, tile.y, tile.width, tile.height
+                if tile.checkpoint:
+                    if tile.reset_point not in spawn_points:
+                        spawn_points.append(tile.reset_point)
+                        self.spawns.append(self.spawn_cell(tile.reset_point))
+                    self.shapes.append(('checkpoint', spawn_points.index(tile.reset_point)) + box)
+                if tile.end:
+                    self.shapes.append(('end', None) + box)
+                if tile.warp[0]:
+                    self.shapes.append(('warp', self.cell_of(tile.warp[1] - self.width / 2, tile.warp[2] - self.height / 2)) + box)
+        for i, coin in enumerate(level.coins):
+            self.shapes.append(('coin', 1 << i, coin.x, coin.y, coin.radius, None))
+        for i, key in enumerate(level.keys):
+            self.shapes.append(('key', 1 << i, key.x, key.y, key.size[0], key.size[1]))
+        self.key_ids = [key.id for key in level.keys]
+        self.coins_needed = level.coins_needed
+
+        self.enemies = level.enemy_system
+        self.positions = enemy_positions(self.enemies, max_ticks + 1)  # [tick, enemy, x/y]
+        self.radius = self.enemies.radius.copy()
+        self.period = self.find_period()
+
+        self.regions = {}  # Grid: (regions in order, regions grouped by what they do)
+        self.free = {}  # (keys collected, grid): cells not inside of a wall
+        self.counts = {}  # State: things which do something and how many of them each cell touches
+
+    def __repr__(self):
+        return f'Solver({self.level_name}, {self.nx}x{self.ny} cells, period {self.period})'
+
+    # GRID
+
+    def origin(self, grid: int) -> tuple:
+        shift_x, shift_y = self.grids[grid]
+        return self.gx + shift_x, self.gy + shift_y
+
+    def cell_of(self, x: float, y: float) -> tuple:
+        """The grid and cell (row, column) of a player with this top left corner, to the closest pixel."""
+        i, shift_x = divmod(round(x - self.gx), self.step)
+        j, shift_y = divmod(round(y - self.gy), self.step)
+        i = min(max(i, 0), self.nx - 1)
+        j = min(max(j, 0), self.ny - 1)
+        return self.grids.index((shift_x, shift_y)), (j, i)
+
+    def position(self, grid: int, j: int, i: int) -> tuple:
+        gx, gy = self.origin(grid)
+        return gx + i * self.step, gy + j * self.step
+
+    def spawn_cell(self, point: tuple) -> tuple:
+        """Where Level.spawn puts the player for a spawn point."""
+        return self.cell_of(point[0] + self.level.ox - self.width / 2, point[1] + self.level.oy - self.height / 2)
+
+    def span(self, low: float, high: float, origin: float, count: int, strict: bool=False) -> slice:
+        """Cells whose position is between low and high, edges included unless strict."""
+        if strict:
+            start, stop = math.floor((low - origin) / self.step) + 1, math.ceil((high - origin) / self.step) - 1
+        else:
+            start, stop = math.ceil((low - origin) / self.step), math.floor((high - origin) / self.step)
+        return slice(min(max(start, 0), count), min(max(stop + 1, 0), count))
+
+    def box_region(self, kind: str, value, box: tuple, grid: int, strict: bool=False) -> Region:
+        """Cells where the player's box overlaps a x, y, width, height box. Touching counts unless strict."""
+        x, y, w, h = box
+        gx, gy = self.origin(grid)
+        columns = self.span(x - self.width, x + w, gx, self.nx, strict)
+        rows = self.span(y - self.height, y + h, gy, self.ny, strict)
+        return Region(kind, value, rows, columns, np.ones((rows.stop - rows.start, columns.stop - columns.start), dtype=bool))
+
+    def circle_region(self, kind: str, value, cx: float, cy: float, radius: float, grid: int) -> Region:
+        """Cells where the player's box is within radius of a point, the same as Enemy.colliding."""
+        gx, gy = self.origin(grid)
+        columns = self.span(cx - radius - self.width, cx + radius, gx, self.nx)
+        rows = self.span(cy - radius - self.height, cy + radius, gy, self.ny)
+        xs = gx + np.arange(columns.start, columns.stop) * self.step
+        ys = gy + np.arange(rows.start, rows.stop) * self.step
+        dx = cx - np.clip(cx, xs, xs + self.width)
+        dy = cy - np.clip(cy, ys, ys + self.height)
+        return Region(kind, value, rows, columns, dy[:, None] ** 2 + dx[None, :] ** 2 <= radius * radius)
+
+    def things(self, grid: int) -> tuple:
+        """Regions of everything the player can touch on a grid, in order and grouped."""
+        entry = self.regions.get(grid)
+        if entry is None:
+            things = []
+            for kind, value, x, y, width, height in self.shapes:
+                if height is None:
+                    things.append(self.circle_region(kind, value, x, y, width, grid))
+                else:
+                    things.append(self.box_region(kind, value, (x, y, width, height), grid))
+            entry = self.regions[grid] = things, self.group(things)
+        return entry
+
+    def group(self, things: list) -> list:
+        """Merges regions which do the same thing, like every tile of a checkpoint, since touching one or several
+        of them is the same. Keeps the order they first show up in."""
+        groups = {}
+        for thing in things:
+            groups.setdefault((thing.kind, thing.value), []).append(thing)
+        merged = []
+        for (kind, value), members in groups.items():
+            rows = slice(min(thing.rows.start for thing in members), max(thing.rows.stop for thing in members))
+            columns = slice(min(thing.columns.start for thing in members), max(thing.columns.stop for thing in members))
+            mask = np.zeros((rows.stop - rows.start, columns.stop - columns.start), dtype=bool)
+            for thing in members:
+                mask[thing.rows.start - rows.start:thing.rows.stop - rows.start,
+                     thing.columns.start - columns.start:thing.columns.stop - columns.start] |= thing.mask
+            merged.append(Region(kind, value, rows, columns, mask))
+        return merged
+
+    def free_cells(self, keys: int, grid: int) -> np.ndarray:
+        """Cells the player fits in without being inside of a wall, with walls opened by these keys gone."""
+        free = self.free.get((keys, grid))
+        if free is None:
+            opened = {key_id for i, key_id in enumerate(self.key_ids) if keys & 1 << i}
+            free = np.ones((self.ny, self.nx), dtype=bool)
+            for wall in self.level.walls:
+                if wall.id is not None and wall.id in opened:
+                    continue
+                crect = wall.crect
+                region = self.box_region('wall', None, (crect.x, crect.y, crect.width, crect.height), grid, strict=True)
+                free[region.rows, region.columns] = False
+            self.free[keys, grid] = free
+        return free
+
+    # ENEMIES
+
+    def find_period(self) -> int:
+        """Ticks after which every enemy is back where it was, or None if that doesn't happen
+        within max_period ticks (or can't be told apart from the searched ticks)."""
+        positions = self.positions
+        if positions.shape[1] == 0:
+            return 1
+        ticks = len(positions) - 1
+        first = positions[1]
+        close = np.nonzero(np.abs(positions[2:] - first).max(axis=(1, 2)) < 1e-6)[0] + 1
+        for period in close:
+            if period > self.max_period or period * 2 > ticks:
+                break
+            if np.abs(positions[1 + period:] - positions[1:-period]).max() < 1e-6:
+                return int(period)
+        return None
+
+    def deadly(self, tick: int, grid: int) -> np.ndarray:
+        """Cells where the player gets hit during this tick. Enemies move before the player is checked."""
+        deadly = np.zeros((self.ny, self.nx), dtype=bool)
+        for (x, y), radius in zip(self.positions[tick + 1], self.radius):
+            region = self.circle_region('enemy', None, x, y, radius, grid)
+            deadly[region.rows, region.columns] |= region.mask
+        return deadly
+
+    def dies(self, grid: int, j: int, i: int, tick: int) -> bool:
+        x, y = self.position(grid, j, i)
+        for (ex, ey), radius in zip(self.positions[tick + 1], self.radius):
+            dx = ex - min(max(ex, x), x + self.width)
+            dy = ey - min(max(ey, y), y + self.height)
+            if dx * dx + dy * dy <= radius * radius:
+                return True
+        return False
+
+    # RULES
+
+    def effect(self, state: tuple, thing: Region):
+        """What touching a thing does in a state: (new state, cell teleported to or None), SOLVED,
+        or None if it does nothing. Follows Tile.execute_flag and the collisions in game.py."""
+        coins, kept, keys, spawn, grid = state
+        kind = thing.kind
+        if kind == 'checkpoint':
+            if thing.value != spawn or coins != kept:
+                return (coins, coins, keys, thing.value, grid), None
+        elif kind == 'end':
+            if bin(coins).count('1') >= self.coins_needed:
+                return SOLVED
+        elif kind == 'warp':
+            warp_grid, cell = thing.value
+            return (coins, kept, keys, spawn, warp_grid), cell
+        elif kind == 'coin':
+            if not coins & thing.value:
+                return (coins | thing.value, kept, keys, spawn, grid), None
+        elif kind == 'key':
+            if not keys & thing.value:
+                return (coins, kept, keys | thing.value, spawn, grid), None
+        return None
+
+    def apply(self, state: tuple, j: int, i: int, tick: int, enemies: bool=True):
+        """Everything that happens to a player in a cell during a tick, before it moves.
+        Returns (new state, cell) or SOLVED."""
+        grid = state[4]
+        cell = None
+        for thing in self.things(grid)[0]:
+            if thing.covers(j, i):
+                result = self.effect(state, thing)
+                if result is SOLVED:
+                    return SOLVED
+                if result is not None:
+                    state, teleport = result
+                    if teleport is not None:
+                        cell = teleport
+        if enemies and self.dies(grid, j, i, tick):
+            coins, kept, keys, spawn, grid = state
+            grid, cell = self.spawns[spawn]
+            state = kept, kept, keys, spawn, grid
+        return state, (j, i) if cell is None else cell
+
+    def touching(self, state: tuple) -> tuple:
+        """The groups of things which could do something in a state, and how many of them each cell touches.
+        Checkpoints always could, since touching another checkpoint first changes the state."""
+        entry = self.counts.get(state)
+        if entry is None:
+            groups = self.things(state[4])[1]
+            things = [thing for thing in groups if thing.kind == 'checkpoint' or self.effect(state, thing) is not None]
+            count = np.zeros((self.ny, self.nx), dtype=np.uint8)
+            for thing in things:
+                count[thing.rows, thing.columns] += thing.mask
+            entry = self.counts[state] = things, count
+        return entry
+
+    @staticmethod
+    def dominates(state: tuple, other: tuple) -> bool:
+        """True if a state is at least as good as another one anywhere: the same spawn and grid,
+        and every coin (kept or not) and key of the other one. Coins are only ever needed and walls only ever in the way."""
+        return (state[3:] == other[3:] and state[0] & other[0] == other[0]
+                and state[1] & other[1] == other[1] and state[2] & other[2] == other[2])
+
+    # SEARCH
+
+    def advance(self, state: tuple, reached: np.ndarray, deadly: dict, tick: int, after: dict, enemies: bool):
+        """Apply the rules to every cell reached in a state, adding where the player ends up to after.
+        Cells which only touch one thing are done all at once, the rest one at a time.
+        Returns the cell the level gets completed from, or None."""
+        things, count = self.touching(state)
+        touches = count > 0
+        if deadly is None:
+            plain = reached & ~touches
+        else:
+            deadly = deadly(state[4])
+            plain = reached & ~touches & ~deadly
+            died = reached & ~touches & deadly
+            if died.any():
+                coins, kept, keys, spawn, grid = state
+                grid, cell = self.spawns[spawn]
+                self.reach(after, (kept, kept, keys, spawn, grid), cell)
+        self.place(after, state, plain)
+
+        single = reached & (count == 1)
+        if deadly is not None:
+            single &= ~deadly
+        if single.any():
+            for thing in things:
+                window = single[thing.rows, thing.columns] & thing.mask
+                if not window.any():
+                    continue
+                result = self.effect(state, thing)
+                if result is SOLVED:
+                    j, i = np.argwhere(window)[0]
+                    return j + thing.rows.start, i + thing.columns.start
+                new_state, teleport = (state, None) if result is None else result
+                if teleport is None:
+                    cells = np.zeros_like(reached)
+                    cells[thing.rows, thing.columns] = window
+                    self.place(after, new_state, cells)
+                else:
+                    self.reach(after, new_state, teleport)
+
+        rest = reached & (count > 1) if deadly is None else reached & touches & (deadly | (count > 1))
+        for j, i in np.argwhere(rest):
+            result = self.apply(state, j, i, tick, enemies)
+            if result is SOLVED:
+                return j, i
+            self.reach(after, *result)
+        return None
+
+    def place(self, after: dict, state: tuple, cells: np.ndarray):
+        if state in after:
+            after[state] |= cells
+        else:
+            after[state] = cells
+
+    def reach(self, after: dict, state: tuple, cell: tuple):
+        if state not in after:
+            after[state] = np.zeros((self.ny, self.nx), dtype=bool)
+        after[state][cell] = True
+
+    def move(self, cells: np.ndarray, free: np.ndarray) -> np.ndarray:
+        """Every cell one move (or staying put) away from these, that isn't inside of a wall."""
+        moved = cells.copy()
+        ny, nx = cells.shape
+        for dx, dy in MOVES:
+            if dx == 0 and dy == 0:
+                continue
+            moved[max(dy, 0):ny + min(dy, 0), max(dx, 0):nx + min(dx, 0)] |= cells[max(-dy, 0):ny - max(dy, 0), max(-dx, 0):nx - max(dx, 0)]
+        return moved & free
+
+    def search(self, enemies: bool=True, keep: bool=True) -> tuple:
+        """Returns (status, tick the level gets completed on, its state and cell, the searched ticks, positions explored).
+        The searched ticks are only kept if keep is set."""
+        period = self.period if enemies else 1
+        seen = {}  # (tick in the enemy cycle, state): packed cells already reached at that point of the cycle
+        start_grid, start = self.start
+        start_state = 0, 0, 0, 0, start_grid
+        reached = {start_state: np.zeros((self.ny, self.nx), dtype=bool)}
+        reached[start_state][start] = True
+        history = []
+        memory = explored = 0
+        for tick in range(self.max_ticks):
+            if keep:
+                packed = {state: np.packbits(cells) for state, cells in reached.items()}
+                memory += sum(cells.nbytes for cells in packed.values())
+                history.append(packed)
+                if memory > self.max_memory:
+                    return UNKNOWN, None, None, None, history, explored
+            deadly = None
+            if enemies and len(self.radius):
+                deadly = functools.lru_cache(None)(functools.partial(self.deadly, tick))
+            after = {}
+            for state, cells in reached.items():
+                explored += int(np.count_nonzero(cells))
+                end = self.advance(state, cells, deadly, tick, after, enemies)
+                if end is not None:
+                    return SOLVED, tick, state, tuple(int(n) for n in end), history, explored
+
+            reached = {}
+            for state, cells in after.items():
+                reached[state] = self.move(cells, self.free_cells(state[2], state[4]))
+            for state in list(reached):
+                for other in reached:
+                    if other != state and self.dominates(other, state):
+                        reached[state] &= ~reached[other]
+            for state, cells in list(reached.items()):
+                if period is not None:
+                    key = (tick + 1) % period, state
+                    packed = np.packbits(cells)
+                    old = seen.get(key)
+                    if old is not None:
+                        seen[key] = packed | old
+                        cells = np.unpackbits(packed & ~old, count=cells.size).reshape(cells.shape).astype(bool)
+                    else:
+                        seen[key] = packed
+                if cells.any():
+                    reached[state] = cells
+                else:
+                    del reached[state]
+            if not reached:  # Nothing new can be reached anymore
+                return UNSOLVABLE, None, None, None, history, explored
+        return UNKNOWN, None, None, None, history, explored
+
+    def unpack(self, packed: np.ndarray) -> np.ndarray:
+        return np.unpackbits(packed, count=self.ny * self.nx).reshape(self.ny, self.nx).astype(bool)
+
+    def backtrack(self, history: list, tick: int, state: tuple, cell: tuple) -> tuple:
+        """Works out the moves which lead to a state and cell at a tick. Returns (moves, deaths)."""
+        moves = []
+        deaths = 0
+        for previous in range(tick - 1, -1, -1):
+            layer = {layer_state: self.unpack(packed) for layer_state, packed in history[previous].items()}
+            found = None
+            for layer_state, cells in sorted(layer.items(), key=lambda item: item[0] != state):  # Same state first
+                for dx, dy in MOVES:  # Walked there
+                    j, i = cell[0] - dy, cell[1] - dx
+                    if 0 <= j < self.ny and 0 <= i < self.nx and cells[j, i]:
+                        if self.apply(layer_state, j, i, previous) == (state, (j, i)):
+                            found = layer_state, (j, i), (dx, dy)
+                            break
+                if found:
+                    break
+            if found is None:  # Teleported (warped or died) and then moved
+                for layer_state, cells in layer.items():
+                    grid = layer_state[4]
+                    teleports = self.deadly(previous, grid)
+                    for thing in self.things(grid)[0]:
+                        if thing.kind == 'warp':
+                            teleports[thing.rows, thing.columns] |= thing.mask
+                    for j, i in np.argwhere(cells & teleports):
+                        result = self.apply(layer_state, j, i, previous)
+                        if result is SOLVED or result[0] != state:
+                            continue
+                        dy, dx = cell[0] - result[1][0], cell[1] - result[1][1]
+                        if (dx, dy) in MOVES:
+                            found = layer_state, (int(j), int(i)), (dx, dy)
+                            break
+                    if found:
+                        break
+            if found is None:
+                raise RuntimeError(f'No way to {state} {cell} at tick {tick} found')
+            state, cell, move = found
+            if self.dies(state[4], *cell, previous):
+                deaths += 1
+            moves.append(move)
+        moves.reverse()
+        return moves, deaths
+
+    def replay(self, moves: list, ticks: int, deaths: int) -> Replay:
+        """Turns moves in to the key presses which make them."""
+        replay = Replay(self.level_name)
+        held = set()
+        for tick, (dx, dy) in enumerate(moves):
+            want = set()
+            if dx:
+                want.add(pygame.K_d if dx > 0 else pygame.K_a)
+            if dy:
+                want.add(pygame.K_s if dy > 0 else pygame.K_w)
+            for key in sorted(held - want):
+                replay.record(tick, key, False)
+            for key in sorted(want - held):
+                replay.record(tick, key, True)
+            held = want
+        replay.finish(ticks, deaths)
+        return replay
+
+    def solve(self) -> Solution:
+        start = time.perf_counter()
+        status, *_, explored = self.search(enemies=False, keep=False)  # Enemies can only make things harder
+        if status == UNSOLVABLE:
+            return Solution(self.level_name, UNSOLVABLE, explored=explored, seconds=time.perf_counter() - start)
+        status, tick, state, cell, history, more = self.search()
+        explored += more
+        if status != SOLVED:
+            return Solution(self.level_name, status, explored=explored, seconds=time.perf_counter() - start)
+        moves, deaths = self.backtrack(history, tick, state, cell)
+        if self.dies(state[4], *cell, tick):  # Completing the level doesn't stop the player from getting hit
+            deaths += 1
+        replay = self.replay(moves, tick + 1, deaths)
+        return Solution(self.level_name, SOLVED, tick + 1, deaths, replay, replay.verify(), explored, time.perf_counter() - start)
+
+
+def solve_level(level_name: str, max_ticks: int=3600) -> Solution:
+    return Solver(level_name, max_ticks).solve()
+
+
+def solve_campaign(names: list, max_ticks: int=3600, processes: int=None):
+    """Solves levels on a pool of processes, yielding each Solution in order as soon as it's done."""
+    with multiprocessing.Pool(processes) as pool:
+        yield from pool.imap(functools.partial(solve_level, max_ticks=max_ticks), names)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find the fastest run through levels, or prove they can\'t be completed.')
+    parser.add_argument('names', nargs='*', help='Levels to solve, every campaign level if none are given')
+    parser.add_argument('--campaign', action='append', default=[], help='Solve every level in this campaign file')
+    parser.add_argument('--max-ticks', type=int, default=3600, help='Longest run to look for')
+    parser.add_argument('--processes', type=int, default=None, help='Levels solved at once, the amount of CPUs if not given')
+    parser.add_argument('--save', action='store_true', help='Save the fastest runs to replays/solved/<level>.rpl')
+    args = parser.parse_args()
+
+    names = list(args.names)
+    for path in args.campaign:
+        with open(path) as data:
+            names.extend(json.loads(data.read())['levels'])
+    names = names or levels.campaign_levels()
+
+    broken = 0
+    for solution in solve_campaign(names, args.max_ticks, args.processes):
+        if solution.status == SOLVED:
+            print(f'{solution.level_name}: {solution.ticks} ticks ({solution.ticks / 60:.2f}s), {solution.deaths} deaths, '
+                  f'{"verified" if solution.verified else "NOT verified"} ({solution.seconds:.1f}s)')
+            if args.save:
+                solution.replay.save(os.path.join('replays', 'solved', f'{solution.level_name}.rpl'))
+        else:
+            print(f'{solution.level_name}: {solution.status.upper()} ({solution.seconds:.1f}s)')
+            broken += solution.status == UNSOLVABLE
+    if broken:
+        raise SystemExit(1)
@@ -1,8 +1,44 @@
 """Any classes which are image related go here."""
 from base import Base, size
+from collections import OrderedDict
 import pygame
 import math
 
+rotation_step = 1  # Degrees. Angles are rounded to the nearest step so close angles share one rotated image
+rotation_cache = OrderedDict()  # (image id, angle bucket): (image, rotated image, mask, bbox size, origin offset)
+rotation_cache_size = 1024  # Least recently used rotations get thrown out past this many
+
+
+def rotate_image(image, angle: float) -> tuple:
+    """Returns the rotated image, its mask, its bounding box size and the offset to draw it at
+    so it stays rotated around its center. Rotations are cached per image and angle step."""
+    bucket = round(angle / rotation_step)
+    key = id(image), bucket
+    entry = rotation_cache.get(key)
+    if entry is not None and entry[0] is image:
+        rotation_cache.move_to_end(key)
+        return entry[1:]
+
+    angle = bucket * rotation_step
+    w, h = image.get_size()
+    box = [pygame.math.Vector2(p) for p in [(0, 0), (w, 0), (w, -h), (0, -h)]]
+    box_rotate = [p.rotate(angle) for p in box]
+
+    min_box = (min(box_rotate, key=lambda p: p[0])[0], min(box_rotate, key=lambda p: p[1])[1])
+    max_box = (max(box_rotate, key=lambda p: p[0])[0], max(box_rotate, key=lambda p: p[1])[1])
+
+    pivot = pygame.math.Vector2(w / 2, -h / 2)
+    pivot_rotate = pivot.rotate(angle)
+    pivot_move = pivot_rotate - pivot
+    offset = min_box[0] - pivot_move[0], -max_box[1] + pivot_move[1]
+
+    rotated_image = pygame.transform.rotate(image, angle)
+    entry = image, rotated_image, pygame.mask.from_surface(rotated_image), rotated_image.get_rect().size, offset
+    rotation_cache[key] = entry  # Keeping the image in the entry stops its id from being reused
+    if len(rotation_cache) > rotation_cache_size:
+        rotation_cache.popitem(last=False)
+    return entry[1:]
+
 
 class Sprite(Base):
     """Class for drawing an image."""
@@ -48,38 +84,29 @@ class Sprite(Base):
             return False
 
     def draw(self, screen, offsets: tuple):
-        if not self.oob():
+        if not self.oob(offsets):
             offx, offy = offsets
             if self.facing == 0:
                 screen.blit(self.image, (self.x + offx, self.y + offy))
             else:
-                w, h = self.size
-                box = [pygame.math.Vector2(p) for p in [(0, 0), (w, 0), (w, -h), (0, -h)]]
-                box_rotate = [p.rotate(self.facing) for p in box]
-
-                min_box = (min(box_rotate, key=lambda p: p[0])[0], min(box_rotate, key=lambda p: p[1])[1])
-                max_box = (max(box_rotate, key=lambda p: p[0])[0], max(box_rotate, key=lambda p: p[1])[1])
-
-                pivot = pygame.math.Vector2(self.size[0] / 2, -self.size[1] / 2)
-                pivot_rotate = pivot.rotate(self.facing)
-                pivot_move = pivot_rotate - pivot
-
-                origin = (self.x + offx + min_box[0] - pivot_move[0], self.y + offy - max_box[1] + pivot_move[1])
-
-                rotated_image = pygame.transform.rotate(self.image, self.facing)
-                self.bbox_size = rotated_image.get_rect().size
-                self.mask = pygame.mask.from_surface(rotated_image)
-                screen.blit(rotated_image, origin)
+                rotated_image, self.mask, self.bbox_size, origin = rotate_image(self.image, self.facing)
+                screen.blit(rotated_image, (self.x + offx + origin[0], self.y + offy + origin[1]))
 
     def face(self, other):
         x = other.x - self.x
         y = other.y - self.y
         self.facing = math.degrees(math.atan2(y, x))
 
-    def oob(self) -> bool:
-        outside_x = self.x + self.bbox_size[0] < 0 and self.x - self.bbox_size[0] > size[0]
-        outside_y = self.y + self.bbox_size[1] < 0 and self.y - self.bbox_size[1] > size[1]
-        return outside_x and outside_y
+    def oob(self, offsets: tuple=(0, 0)) -> bool:
+        """True if this sprite would be drawn completely off screen."""
+        x, y = self.x + offsets[0], self.y + offsets[1]
+        outside_x = x + self.bbox_size[0] < 0 or x - self.bbox_size[0] > size[0]
+        outside_y = y + self.bbox_size[1] < 0 or y - self.bbox_size[1] > size[1]
+        return outside_x or outside_y
+
+    @property
+    def bounds(self) -> tuple:
+        return self.x, self.y, self.bbox_size[0], self.bbox_size[1]
 
     @property
     def origin(self) -> tuple: